@@ -1,7 +1,28 @@
+import logging
+import os
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from app.config.config import Config
-from .extensions import db
+from app.config.config import config
+from .extensions import db, cache, migrate
+from .services import importer
+from .services.auth import auth_state
+from .services.background import background_tasks
+from .services.avatars import avatar_store
+from .services.passwords import password_hasher
+from .services.ratelimit import rate_limiter
+from .services.metrics import request_metrics
+from .services.pool_metrics import pool_stats
+from .utils.log import init_logging
+from .utils.serializer import FastJSONProvider
+from .services.favorites import favorite_store
+from .services.progress import progress_buffer
+from .services.rankings import rankings
+from .services.search_history import search_history_store
+from .services.search_index import search_index
+from .services.recommendations import recommendations
+from .services.similar import similar_index
+from .services.static_files import static_files
+from .services.suggest import suggester
 from .routes.movies import movies_bp
 # 使用新创建的auth_bp
 from .routes.auth import auth_bp  
@@ -35,9 +56,16 @@ from flask_jwt_extended import JWTManager
 #             'message': f'登录失败: {str(e)}'
 #         }), 500
 
-def create_app():
+def create_app(config_name=None):
     app = Flask(__name__, static_folder='static')
-    app.config.from_object(Config)
+    # 按 APP_ENV 选择配置: development / production / testing
+    config_name = config_name or os.environ.get('APP_ENV') or 'default'
+    app.config.from_object(config[config_name])
+    # 安装了 orjson 时使用更快的 JSON 编码
+    app.json = FastJSONProvider(app)
+    
+    # 初始化日志，请求线程只负责入队
+    init_logging(app)
     
     # 初始化CORS
     CORS(app, resources={
@@ -49,10 +77,15 @@ def create_app():
         }
     })
     
+    # 后台线程在进程收到第一个请求时才启动，CLI 命令和子进程中不启动
+    background_tasks.init_app(app)
+    
     # 确保静态目录存在
-    import os
     os.makedirs(os.path.join(app.root_path, 'static', 'avatars'), exist_ok=True)
     
+    # 静态文件缓存头、预压缩与 X-Accel-Redirect
+    static_files.init_app(app)
+    
     # 添加静态文件跨域支持
     @app.after_request
     def add_cors_headers(response):
@@ -60,11 +93,28 @@ def create_app():
             response.headers['Access-Control-Allow-Origin'] = '*'
         return response
     
-    # 初始化数据库
+    # 初始化数据库，结构变更通过 flask db upgrade 执行 migrations/ 中的迁移
     db.init_app(app)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
     
-    # 初始化JWT
+    # 初始化缓存，数据提交后按命名空间失效
+    cache.init_app(app)
+    from .models.category import Category
+    from .models.movie import Movie
+    from .models.movie_ranking import MovieRanking
+    cache.watch(Category, lambda category: ['categories'])
+    cache.watch(Movie, lambda movie: [f'movie:{movie.id}', 'rankings', 'categories'])
+    cache.watch(MovieRanking, lambda ranking: ['rankings'])
+    
+    # 初始化JWT，当前用户从进程内缓存解析，注销的令牌记录在内存中
     jwt = JWTManager(app)
+    auth_state.init_app(app, jwt)
+    
+    # 密码哈希在有界线程池中计算
+    password_hasher.init_app(app)
+    
+    # 登录、注册限流，在计算密码哈希之前拒绝
+    rate_limiter.init_app(app)
     
     # 注册蓝图
     app.register_blueprint(movies_bp, url_prefix='/api')
@@ -88,10 +138,43 @@ def create_app():
     with app.app_context():
         db.create_all()
     
+    # 注册排行榜刷新命令，并按配置启动后台刷新
+    rankings.init_app(app)
+    
+    # 注册 flask import-movies 批量导入命令
+    importer.init_app(app)
+    
+    # 注册个性化推荐计算命令，并按配置启动后台计算
+    recommendations.init_app(app)
+    
+    # 加载已持久化的相似电影特征矩阵，注册 flask similar-rebuild 命令
+    similar_index.init_app(app)
+    
+    # 头像缩略图生成与文件回收，注册 flask avatars-gc 命令
+    avatar_store.init_app(app)
+    
+    # 收藏 id 列表的进程内缓存
+    favorite_store.init_app(app)
+    
+    # 观看进度批量写入
+    progress_buffer.init_app(app)
+    
+    # 搜索历史批量写入和定期压缩
+    search_history_store.init_app(app)
+    
+    # 搜索倒排索引的后台增量刷新
+    search_index.init_app(app)
+    
+    # 搜索补全词典的后台重建
+    suggester.init_app(app)
+    
+    # 请求耗时与 SQL 统计，/metrics 输出 Prometheus 格式
+    request_metrics.init_app(app)
+    
     # 添加错误处理
     @app.errorhandler(500)
     def handle_500_error(e):
-        print(f"服务器错误: {str(e)}")
+        logging.getLogger(__name__).error('服务器错误: %s', e)
         return jsonify({
             'status': 'error',
             'message': f'服务器内部错误: {str(e)}'
@@ -109,4 +192,12 @@ def create_app():
     def test():
         return {'message': 'API is working'}
     
+    # 连接池状态
+    @app.route('/api/metrics/pool')
+    def pool_metrics():
+        return jsonify({
+            'status': 'success',
+            'data': pool_stats(db.engine)
+        })
+    
     return app 
\ No newline at end of file
@@ -1,10 +1,14 @@
 import os
 from datetime import timedelta
+from app.services.pool_metrics import TimedQueuePool
 
 class Config:
     # 基础配置
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     
+    # 日志级别，逐行明细使用 DEBUG 级别
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    
     # MySQL配置
     MYSQL_HOST = os.environ.get('MYSQL_HOST') or 'localhost'
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT') or 3306)
@@ -15,12 +19,142 @@ class Config:
     # SQLAlchemy配置
     SQLALCHEMY_DATABASE_URI = f'mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True  # 启用SQL查询日志
+    SQLALCHEMY_ECHO = False
+    
+    # 连接池配置: pre_ping 丢弃闲置后被 MySQL 断开的连接，recycle 要小于 wait_timeout
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 10),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+    
+    # 单个请求中同一条 SQL 执行超过该次数时记为疑似 N+1 查询
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 10)
+    
+    # 缓存配置: memory 为进程内 LRU，redis 为共享缓存
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 300)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    
+    # 排行榜后台刷新间隔（秒），默认 0: 只通过 flask rankings-refresh（cron）刷新，避免每个 worker 各算一遍
+    RANKINGS_REFRESH_INTERVAL = int(os.environ.get('RANKINGS_REFRESH_INTERVAL') or 0)
+    
+    # 观看进度缓冲: 每隔多少秒或积累多少条后批量写入，间隔为 0 时每次直接写入
+    PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL') or 5)
+    PROGRESS_FLUSH_SIZE = int(os.environ.get('PROGRESS_FLUSH_SIZE') or 500)
+    # 搜索历史: 每个用户保留的搜索词数、展示天数、表中保留天数，进程内缓存的用户数和过期秒数，
+    # 批量写入与压缩间隔
+    SEARCH_HISTORY_SIZE = int(os.environ.get('SEARCH_HISTORY_SIZE') or 8)
+    SEARCH_HISTORY_WINDOW_DAYS = int(os.environ.get('SEARCH_HISTORY_WINDOW_DAYS') or 7)
+    SEARCH_HISTORY_RETENTION_DAYS = int(os.environ.get('SEARCH_HISTORY_RETENTION_DAYS') or 30)
+    SEARCH_HISTORY_CACHE_USERS = int(os.environ.get('SEARCH_HISTORY_CACHE_USERS') or 10000)
+    SEARCH_HISTORY_CACHE_TTL = int(os.environ.get('SEARCH_HISTORY_CACHE_TTL') or 30)
+    SEARCH_HISTORY_FLUSH_INTERVAL = float(os.environ.get('SEARCH_HISTORY_FLUSH_INTERVAL') or 5)
+    SEARCH_HISTORY_FLUSH_SIZE = int(os.environ.get('SEARCH_HISTORY_FLUSH_SIZE') or 500)
+    SEARCH_HISTORY_COMPACT_INTERVAL = int(os.environ.get('SEARCH_HISTORY_COMPACT_INTERVAL') or 3600)
+    
+    # 搜索索引后台增量刷新间隔（秒），0 表示在查询时同步刷新
+    SEARCH_INDEX_REFRESH_INTERVAL = int(os.environ.get('SEARCH_INDEX_REFRESH_INTERVAL') or 30)
+    # 搜索补全词典的后台重建间隔（秒），0 表示在查询时同步重建
+    SUGGEST_REBUILD_INTERVAL = int(os.environ.get('SUGGEST_REBUILD_INTERVAL') or 300)
+    # 相似电影索引的后台构建和增量刷新间隔（秒），0 表示在查询时同步刷新
+    SIMILAR_INDEX_REFRESH_INTERVAL = int(os.environ.get('SIMILAR_INDEX_REFRESH_INTERVAL') or 30)
+    
+    # 个性化推荐的后台计算间隔（秒）和进程数。默认为 0，由 cron 定时执行
+    # flask recommendations-refresh，避免每个 web worker 各自启动一组计算进程
+    RECOMMENDATIONS_REFRESH_INTERVAL = int(os.environ.get('RECOMMENDATIONS_REFRESH_INTERVAL') or 0)
+    RECOMMENDATIONS_WORKERS = int(os.environ.get('RECOMMENDATIONS_WORKERS') or 0) or None
+    
+    # 头像: 上传大小和像素上限，处理线程数，以及请求等待处理完成的最长秒数
+    AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES') or 5 * 1024 * 1024)
+    AVATAR_MAX_PIXELS = int(os.environ.get('AVATAR_MAX_PIXELS') or 40_000_000)
+    AVATAR_WORKERS = int(os.environ.get('AVATAR_WORKERS') or 2)
+    AVATAR_PROCESS_TIMEOUT = float(os.environ.get('AVATAR_PROCESS_TIMEOUT') or 30)
+    
+    # 静态文件: python 由 Flask 发送，x-accel / x-sendfile 交给前端代理发送；
+    # STATIC_MAX_AGE 为文件名不带内容哈希的文件的缓存秒数
+    STATIC_DELIVERY = os.environ.get('STATIC_DELIVERY') or 'python'
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE') or 3600)
+    STATIC_ACCEL_PREFIX = os.environ.get('STATIC_ACCEL_PREFIX') or '/_static/'
+    
+    # 进程内缓存收藏 id 列表的最大用户数和过期秒数（内存缓存后端下其他进程写入的最长延迟）
+    FAVORITES_CACHE_USERS = int(os.environ.get('FAVORITES_CACHE_USERS') or 10000)
+    FAVORITES_CACHE_TTL = int(os.environ.get('FAVORITES_CACHE_TTL') or 30)
+    
+    # 相似电影特征矩阵目录，默认 instance/similar；为空字符串时只在内存中构建
+    SIMILAR_INDEX_DIR = os.environ.get('SIMILAR_INDEX_DIR')
     
     # JWT配置
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     
+    # 校验令牌时缓存用户信息的秒数和最大用户数
+    AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL') or 30)
+    AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE') or 10000)
+    
+    # 密码哈希: bcrypt / scrypt / pbkdf2，强度为空时使用各算法的默认值；
+    # 同时计算的线程数和排队上限，超出时返回 503
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'bcrypt'
+    PASSWORD_HASH_COST = int(os.environ.get('PASSWORD_HASH_COST') or 0) or None
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 0) or None
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 32)
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 10)
+    
+    # 限流: 每条规则为 (维度 ip/username, 次数, 窗口秒数)；
+    # 后端为空时与 CACHE_BACKEND 相同，redis 时多个 worker 共享计数
+    RATELIMIT_ENABLED = (os.environ.get('RATELIMIT_ENABLED') or 'true').lower() == 'true'
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or None
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL') or None
+    RATELIMIT_MAX_KEYS = int(os.environ.get('RATELIMIT_MAX_KEYS') or 100000)
+    # 反向代理层数，大于 0 时从 X-Forwarded-For 取客户端地址
+    RATELIMIT_TRUSTED_PROXIES = int(os.environ.get('RATELIMIT_TRUSTED_PROXIES') or 0)
+    RATELIMIT_POLICIES = {
+        'login': [('ip', 30, 60), ('username', 10, 300)],
+        'register': [('ip', 5, 3600)],
+    }
+    
     # CORS配置
     CORS_ORIGINS = ['http://localhost:5173']
-    CORS_SUPPORTS_CREDENTIALS = True 
\ No newline at end of file
+    CORS_SUPPORTS_CREDENTIALS = True
+
+
+class DevelopmentConfig(Config):
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'DEBUG'
+    SQLALCHEMY_ECHO = True  # 启用SQL查询日志
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_ENGINE_OPTIONS = dict(
+        Config.SQLALCHEMY_ENGINE_OPTIONS,
+        pool_size=int(os.environ.get('DB_POOL_SIZE') or 20),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW') or 30),
+    )
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI') or 'sqlite://'
+    # SQLite 内存库使用单连接，不适用连接池参数
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    RANKINGS_REFRESH_INTERVAL = 0
+    PROGRESS_FLUSH_INTERVAL = 0
+    SEARCH_HISTORY_FLUSH_INTERVAL = 0
+    SIMILAR_INDEX_DIR = ''
+    RECOMMENDATIONS_REFRESH_INTERVAL = 0
+    SEARCH_INDEX_REFRESH_INTERVAL = 0
+    SUGGEST_REBUILD_INTERVAL = 0
+    SIMILAR_INDEX_REFRESH_INTERVAL = 0
+    PASSWORD_HASH_COST = 4
+    RATELIMIT_ENABLED = False
+
+
+config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': DevelopmentConfig
+}
@@ -1,3 +1,7 @@
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from app.services.cache import Cache
 
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy()
+migrate = Migrate()
+cache = Cache()
@@ -0,0 +1,36 @@
+from ..extensions import db
+from datetime import datetime
+
+class Favorite(db.Model):
+    __tablename__ = 'favorites'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='uq_favorites_user_movie'),
+        db.Index('ix_favorites_user_created_at', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def query_for_user(cls, user_id):
+        """用户收藏与电影信息的联表查询，收藏时间命名为 add_time，已删除的电影不返回"""
+        from app.models.movie import Movie
+
+        return db.session.query(
+            cls.id, cls.movie_id, cls.created_at.label('add_time'), Movie.title, Movie.description, Movie.poster_url,
+            Movie.release_date, Movie.movie_type, Movie.director, Movie.rating
+        ).join(Movie, Movie.id == cls.movie_id).filter(cls.user_id == user_id)
+
+    @classmethod
+    def page_for_user(cls, user_id, limit, cursor=None):
+        """按收藏时间倒序分页，返回 (rows, has_more)"""
+        from app.utils.pagination import keyset_filter
+
+        query = keyset_filter(cls.query_for_user(user_id), cls.created_at, cls.id, cursor)
+        rows = query.limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    def __repr__(self):
+        return f'<Favorite User {self.user_id} - Movie {self.movie_id}>'
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class WatchHistory(db.Model):
     __tablename__ = 'watch_history'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='uq_watch_history_user_movie'),
+        db.Index('ix_watch_history_user_watch_time', 'user_id', 'watch_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -19,5 +23,27 @@ class WatchHistory(db.Model):
         self.movie_id = movie_id
         self.progress = progress
         
+    @classmethod
+    def query_for_user(cls, user_id):
+        """用户历史与电影标题、海报的联表查询，电影已删除时后两者为 None"""
+        from app.models.movie import Movie
+
+        return db.session.query(
+            cls.id, cls.movie_id, cls.watch_time, cls.progress, Movie.title, Movie.poster_url
+        ).outerjoin(Movie, Movie.id == cls.movie_id).filter(cls.user_id == user_id)
+
+    @classmethod
+    def page_for_user(cls, user_id, limit, cursor=None):
+        """按观看时间倒序分页查询用户历史，电影标题和海报在同一条联表查询中取回
+
+        返回 (rows, has_more)，rows 的每一项包含 id、movie_id、watch_time、progress、
+        title 和 poster_url，电影已删除时后两者为 None。
+        """
+        from app.utils.pagination import keyset_filter
+
+        query = keyset_filter(cls.query_for_user(user_id), cls.watch_time, cls.id, cursor)
+        rows = query.limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+        
     def __repr__(self):
         return f'<WatchHistory {self.id} - User {self.user_id} - Movie {self.movie_id}>' 
\ No newline at end of file
@@ -1,8 +1,18 @@
 from app.extensions import db
+from app.models.movie_category import movie_category
+from app.utils.serializer import movie_serializer
 from datetime import datetime
 
 class Movie(db.Model):
     __tablename__ = 'movie'
+    __table_args__ = (
+        db.Index('ix_movie_movie_type', 'movie_type'),
+        # 列表按 (rating, id) / (release_date, id) 做游标分页
+        db.Index('ix_movie_rating_id', 'rating', 'id'),
+        db.Index('ix_movie_release_date_id', 'release_date', 'id'),
+        # 搜索索引按 updated_at 增量刷新
+        db.Index('ix_movie_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -15,19 +25,11 @@ class Movie(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    categories = db.relationship('Category', secondary=movie_category,
+                                 backref=db.backref('movies', lazy='dynamic'))
+    
     def __repr__(self):
         return f'<Movie {self.title}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'release_date': self.release_date.strftime('%Y-%m-%d') if self.release_date else None,
-            'movie_type': self.movie_type,
-            'poster_url': self.poster_url,
-            'director': self.director,
-            'rating': self.rating,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        } 
\ No newline at end of file
+        return movie_serializer.one(self) 
\ No newline at end of file
@@ -0,0 +1,10 @@
+from app.extensions import db
+
+# 电影与分类的多对多关联，主键 (movie_id, category_id)，
+# 另建 (category_id, movie_id) 索引用于按分类查电影
+movie_category = db.Table(
+    'movie_category',
+    db.Column('movie_id', db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_movie_category_category_movie', 'category_id', 'movie_id'),
+)
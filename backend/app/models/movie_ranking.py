@@ -3,14 +3,19 @@ from app.extensions import db
 
 class MovieRanking(db.Model):
     __tablename__ = 'movie_rankings'
+    __table_args__ = (
+        db.Index('ix_movie_rankings_period_rank', 'period', 'rank'),
+        db.UniqueConstraint('period', 'movie_id', name='uq_movie_rankings_period_movie'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
     rank = db.Column(db.Integer, nullable=False)
     views = db.Column(db.Integer, default=0)
+    period = db.Column(db.String(10), nullable=False, default='all', server_default='all')  # daily / weekly / all
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
-    movie = db.relationship('Movie', foreign_keys=[movie_id], backref=db.backref('ranking', uselist=False))
+    movie = db.relationship('Movie', foreign_keys=[movie_id], backref=db.backref('rankings', lazy='dynamic'))
 
     def to_dict(self):
         return {
@@ -18,5 +23,6 @@ class MovieRanking(db.Model):
             'movie_id': self.movie_id,
             'rank': self.rank,
             'views': self.views,
+            'period': self.period,
             'movie': self.movie.to_dict() if self.movie else None
         } 
\ No newline at end of file
@@ -0,0 +1,13 @@
+from datetime import datetime
+from app.extensions import db
+
+class UserRecommendation(db.Model):
+    """离线计算好的个性化推荐，每个用户一行，请求时按主键读取"""
+    __tablename__ = 'user_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    movie_ids = db.Column(db.JSON, nullable=False)  # 按得分降序排列的电影 id
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserRecommendation {self.user_id}>'
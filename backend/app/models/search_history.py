@@ -3,6 +3,10 @@ from app.extensions import db
 
 class SearchHistory(db.Model):
     __tablename__ = 'search_history'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'search_query', name='uq_search_history_user_query'),
+        db.Index('ix_search_history_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -1,6 +1,6 @@
 from app.extensions import db
+from app.utils.serializer import user_serializer
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -8,25 +8,22 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     avatar = db.Column(db.String(255), nullable=True)
     is_vip = db.Column(db.Integer, default=0)  # 使用is_vip字段，0表示普通用户，1表示VIP
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 用户修改密码的时间，令牌中的密码指纹由它计算；按新配置重新哈希时不变
+    password_changed_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.services.passwords import password_hasher
+        self.password_hash = password_hasher.hash(password)
+        self.password_changed_at = datetime.utcnow()
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from app.services.passwords import password_hasher
+        return password_hasher.verify(self.password_hash, password)
         
     def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'avatar': self.avatar,
-            'is_vip': self.is_vip,  # 返回is_vip字段值
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        } 
\ No newline at end of file
+        return user_serializer.one(self) 
\ No newline at end of file
@@ -1,13 +1,15 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ..models.user import User
 from ..extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta
+from ..services.auth import auth_state, create_token, save_rehashed_password
+from ..services.passwords import PasswordHasherBusy, password_hasher
+from ..services.ratelimit import rate_limiter
+from flask_jwt_extended import jwt_required, current_user, get_jwt
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     """用户登录接口，返回JWT token"""
     try:
@@ -31,17 +33,23 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         # 验证用户
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not password_hasher.verify(user.password_hash, password):
             return jsonify({
                 'status': 'error',
                 'message': '用户名或密码错误'
             }), 401
         
+        # 哈希算法或强度与当前配置不同时，用刚验证过的明文在后台重新计算，
+        # 不让登录请求再等一次慢速哈希；线程池繁忙时留到下次登录
+        if password_hasher.needs_rehash(user.password_hash):
+            app = current_app._get_current_object()
+            user_id, old_hash = user.id, user.password_hash
+            password_hasher.hash_in_background(
+                password, lambda new_hash: save_rehashed_password(app, user_id, old_hash, new_hash)
+            )
+        
         # 创建JWT令牌
-        access_token = create_access_token(
-            identity=user.id,
-            expires_delta=timedelta(days=1)
-        )
+        access_token = create_token(user)
         
         return jsonify({
             'status': 'success',
@@ -50,6 +58,8 @@ def login():
             'username': user.username
         })
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -57,6 +67,7 @@ def login():
         }), 500
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     """用户注册接口"""
     try:
@@ -95,17 +106,14 @@ def register():
         new_user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password)
+            password_hash=password_hasher.hash(password)
         )
         
         db.session.add(new_user)
         db.session.commit()
         
         # 创建JWT令牌
-        access_token = create_access_token(
-            identity=new_user.id,
-            expires_delta=timedelta(days=1)
-        )
+        access_token = create_token(new_user)
         
         return jsonify({
             'status': 'success',
@@ -115,6 +123,8 @@ def register():
             'username': new_user.username
         })
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -126,16 +136,7 @@ def register():
 def get_profile():
     """获取当前用户的配置文件"""
     try:
-        # 从JWT获取用户ID
-        user_id = get_jwt_identity()
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': '用户不存在'
-            }), 404
-            
+        user = current_user
         return jsonify({
             'status': 'success',
             'data': {
@@ -152,3 +153,13 @@ def get_profile():
             'status': 'error',
             'message': f'获取信息失败: {str(e)}'
         }), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """注销当前令牌"""
+    auth_state.revoke(get_jwt())
+    return jsonify({
+        'status': 'success',
+        'message': '已退出登录'
+    })
@@ -1,45 +1,37 @@
+import logging
 from flask import Blueprint, jsonify, request
 from app.models.category import Category
-from app import db
-from sqlalchemy import text
+from app.extensions import db, cache
+from app.models.movie_category import movie_category
 
 categories_bp = Blueprint('categories', __name__)
+logger = logging.getLogger(__name__)
+
+def load_categories():
+    """从category表中获取所有分类及每个分类的电影数，只执行一条分组查询"""
+    movie_count = db.func.count(movie_category.c.movie_id)
+    rows = db.session.query(Category, movie_count) \
+        .outerjoin(movie_category, movie_category.c.category_id == Category.id) \
+        .group_by(Category.id) \
+        .order_by(Category.id) \
+        .all()
+    
+    # 将结果转换为列表
+    categories_list = [dict(category.to_dict(), movie_count=count) for category, count in rows]
+    logger.debug('加载分类 %d 个', len(categories_list))
+    
+    return {
+        'status': 'success',
+        'data': categories_list
+    }
 
 @categories_bp.route('/categories', methods=['GET'])
 def get_categories():
     try:
-        # 测试数据库连接
-        db.session.execute(text('SELECT 1'))
-        print("数据库连接正常")
-        
-        # 检查表是否存在
-        result = db.session.execute(text("SHOW TABLES LIKE 'category'"))
-        if not result.fetchone():
-            print("category表不存在")
-            return jsonify({
-                'status': 'error',
-                'message': 'category表不存在'
-            }), 500
-            
-        # 从category表中获取所有分类
-        categories = Category.query.all()
-        print("数据库查询结果:", categories)
-        
-        # 将结果转换为列表
-        categories_list = []
-        for category in categories:
-            category_dict = category.to_dict()
-            categories_list.append(category_dict)
-            print(f"处理分类: {category_dict}")
-        
-        print("最终分类列表:", categories_list)
-        
-        return jsonify({
-            'status': 'success',
-            'data': categories_list
-        })
+        # 分类几乎不变，走缓存并支持 ETag/304
+        return cache.json_response('categories', 'all', load_categories)
     except Exception as e:
-        print(f"获取分类错误: {str(e)}")
+        logger.exception('获取分类错误')
         return jsonify({
             'status': 'error',
             'message': f'获取分类失败: {str(e)}'
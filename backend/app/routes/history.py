@@ -1,8 +1,10 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from ..models.history import WatchHistory
-from ..models.movie import Movie
-from ..extensions import db
+from ..services.auth import current_user_id
+from ..services.progress import progress_buffer
+from ..utils.pagination import encode_cursor, parse_page_args
+from ..utils.serializer import history_serializer
 from datetime import datetime
 
 history_bp = Blueprint('history', __name__)
@@ -11,36 +13,39 @@ history_bp = Blueprint('history', __name__)
 @jwt_required()
 def get_history():
     # 获取用户ID
-    user_id = get_jwt_identity()
-    
-    # 获取用户观看历史
-    history = WatchHistory.query.filter_by(user_id=user_id).order_by(WatchHistory.watch_time.desc()).all()
-    
-    history_data = []
-    for item in history:
-        movie = Movie.query.get(item.movie_id)
-        if not movie:
-            continue
-            
-        history_data.append({
-            'id': item.id,
-            'movie_id': item.movie_id,
-            'title': movie.title,
-            'poster_url': movie.poster_url,
-            'watch_time': item.watch_time.isoformat(),
-            'progress': item.progress
-        })
+    user_id = current_user_id()
+    
+    try:
+        limit, cursor = parse_page_args(request.args, default_limit=50, parse_value=datetime.fromisoformat)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    # 先写入缓冲中尚未落库的进度
+    if progress_buffer.has_pending(user_id):
+        progress_buffer.flush()
+    
+    # 获取用户观看历史，电影信息在同一条查询中联表取回
+    rows, has_more = WatchHistory.page_for_user(user_id, limit, cursor)
+    
+    # 跳过已删除的电影
+    history_data = history_serializer.many(item for item in rows if item.title is not None)
+    
+    next_cursor = encode_cursor(rows[-1].watch_time, rows[-1].id) if has_more else None
     
     return jsonify({
         'status': 'success',
-        'data': history_data
+        'data': history_data,
+        'next_cursor': next_cursor
     })
 
 @history_bp.route('/api/history', methods=['POST'])
 @jwt_required()
 def add_history():
     data = request.json
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
     if not data or 'movie_id' not in data:
         return jsonify({
@@ -48,50 +53,42 @@ def add_history():
             'message': '未提供电影ID'
         }), 400
         
-    movie_id = data['movie_id']
-    progress = data.get('progress', 0)
+    try:
+        movie_id = int(data['movie_id'])
+        progress = float(data.get('progress') or 0)
+    except (ValueError, TypeError):
+        return jsonify({
+            'status': 'error',
+            'message': '无效的电影ID或进度'
+        }), 400
     
     # 检查电影是否存在
-    movie = Movie.query.get(movie_id)
-    if not movie:
+    if not progress_buffer.movie_exists(movie_id):
         return jsonify({
             'status': 'error',
             'message': '电影不存在'
         }), 404
     
-    # 查找是否已有观看记录
-    history = WatchHistory.query.filter_by(user_id=user_id, movie_id=movie_id).first()
-    
-    if history:
-        # 更新现有记录
-        history.watch_time = datetime.utcnow()
-        history.progress = progress
-    else:
-        # 创建新记录
-        history = WatchHistory(user_id=user_id, movie_id=movie_id, progress=progress)
-        db.session.add(history)
-    
-    db.session.commit()
+    # 进度先写入缓冲区，同一电影只保留最新进度，由后台批量写入
+    watch_time = progress_buffer.add(user_id, movie_id, progress)
     
     return jsonify({
         'status': 'success',
         'message': '观看记录已保存',
         'data': {
-            'id': history.id,
             'movie_id': movie_id,
-            'watch_time': history.watch_time.isoformat(),
-            'progress': history.progress
+            'watch_time': watch_time.isoformat(),
+            'progress': progress
         }
     })
 
 @history_bp.route('/api/history/clear', methods=['DELETE'])
 @jwt_required()
 def clear_history():
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
-    # 删除用户所有观看历史
-    WatchHistory.query.filter_by(user_id=user_id).delete()
-    db.session.commit()
+    # 删除用户所有观看历史，包括尚未写入的进度
+    progress_buffer.clear(user_id)
     
     return jsonify({
         'status': 'success',
@@ -101,7 +98,7 @@ def clear_history():
 @history_bp.route('/api/history/<int:history_id>', methods=['DELETE'])
 @jwt_required()
 def delete_history(history_id):
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     
     # 查找指定记录
     history = WatchHistory.query.filter_by(id=history_id, user_id=user_id).first()
@@ -112,9 +109,8 @@ def delete_history(history_id):
             'message': '记录不存在或无权限删除'
         }), 404
     
-    # 删除记录
-    db.session.delete(history)
-    db.session.commit()
+    # 删除记录，(user_id, movie_id) 唯一
+    progress_buffer.clear(user_id, history.movie_id)
     
     return jsonify({
         'status': 'success',
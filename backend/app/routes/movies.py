@@ -1,67 +1,103 @@
+import logging
 from flask import Blueprint, jsonify, request
 from app.models.movie import Movie
-from app.extensions import db
-from sqlalchemy import text
+from app.models.movie_category import movie_category
+from app.extensions import db, cache
+from app.services.search_index import search_index
+from app.services.background import IndexNotReady
+from app.services.similar import similar_index
+from app.utils.pagination import encode_cursor, keyset_filter, parse_fields, parse_page_args
+from app.utils.serializer import EXPORT_FORMATS, export_response, movie_list_serializer, movie_serializer
+from datetime import date
 
 movies_bp = Blueprint('movies', __name__)
+logger = logging.getLogger(__name__)
+
+# 列表接口允许返回的字段，fields= 只能从中选择
+MOVIE_LIST_FIELDS = ('id', 'title', 'description', 'release_date', 'movie_type',
+                     'poster_url', 'director', 'rating')
+
+# 排序方式: 名称 -> (排序列, 是否降序, 游标值解析函数)
+MOVIE_SORTS = {
+    'id': (None, False, None),
+    'rating': (Movie.rating, True, float),
+    'release_date': (Movie.release_date, True, date.fromisoformat),
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# 导出时服务端游标每次取回的行数
+EXPORT_BATCH_SIZE = 1000
+MAX_SIMILAR = 50
+# 相似电影结果的缓存时间（秒），其他电影变化时不会主动失效
+SIMILAR_CACHE_TTL = 300
 
 @movies_bp.route('/movies', methods=['GET'])
 def get_movies():
     try:
         # 获取查询参数
-        category_id = request.args.get('category_id', type=int)
-        print(f"接收到的category_id参数: {category_id}")
-        
-        # 获取分类名称
-        category_name = None
-        if category_id is not None:
-            # 从分类表中获取分类名称
-            category = db.session.execute(
-                text('SELECT name FROM category WHERE id = :id'),
-                {'id': category_id}
-            ).fetchone()
-            if category:
-                category_name = category[0]
-                print(f"找到分类名称: {category_name}")
+        sort = request.args.get('sort', 'id')
+        logger.debug('电影列表参数 category_id=%s sort=%s', request.args.get('category_id'), sort)
+
+        if sort not in MOVIE_SORTS:
+            return jsonify({
+                'status': 'error',
+                'message': f'不支持的排序方式: {sort}'
+            }), 400
+        sort_column, descending, parse_value = MOVIE_SORTS[sort]
+
+        try:
+            fields = parse_fields(request.args.get('fields'), MOVIE_LIST_FIELDS)
+            limit, cursor = parse_page_args(request.args, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_value)
+            # 未传 limit/cursor 的旧客户端仍返回全部电影
+            paginated = 'limit' in request.args or 'cursor' in request.args
+            # 支持多个分类 category_id=1,3，返回属于任一分类的电影
+            raw_categories = request.args.get('category_id', '')
+            category_ids = sorted({int(value) for value in raw_categories.split(',') if value.strip()})
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
-        # 构建查询
-        query = Movie.query
+        # 只查询需要的列，排序列总是带上以便生成游标
+        columns = [getattr(Movie, name) for name in fields]
+        if sort_column is not None and sort not in fields:
+            columns.append(sort_column)
+        query = db.session.query(*columns)
         
-        # 如果提供了分类名称，则按分类筛选
-        if category_name:
-            print(f"按分类 {category_name} 查询电影")
-            query = query.filter(Movie.movie_type == category_name)
-        else:
-            print("查询所有电影")
+        # 按分类筛选，走 movie_category 的 (category_id, movie_id) 索引
+        if category_ids:
+            query = query.filter(Movie.id.in_(
+                db.select(movie_category.c.movie_id).where(movie_category.c.category_id.in_(category_ids))
+            ))
+
+        query = keyset_filter(query, sort_column, Movie.id, cursor, descending)
             
-        # 执行查询
-        movies = query.all()
-        print(f"查询到 {len(movies)} 部电影")
-        
-        # 将结果转换为列表
-        movies_list = []
-        for movie in movies:
-            movie_dict = {
-                'id': movie.id,
-                'title': movie.title,
-                'description': movie.description,
-                'release_date': movie.release_date.strftime('%Y-%m-%d') if movie.release_date else None,
-                'movie_type': movie.movie_type,
-                'poster_url': movie.poster_url,
-                'director': movie.director,
-                'rating': movie.rating
-            }
-            movies_list.append(movie_dict)
-            print(f"处理电影: {movie_dict}")
+        # 多取一行用于判断是否还有下一页
+        if paginated:
+            rows = query.limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = query.all()
+            has_more = False
         
-        print("最终电影列表:", movies_list)
+        movies_list = movie_list_serializer.only(fields).many(rows)
+        logger.debug('查询到 %d 部电影', len(movies_list))
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(getattr(last, sort) if sort_column is not None else None, last.id)
         
         return jsonify({
             'status': 'success',
-            'data': movies_list
+            'data': movies_list,
+            'next_cursor': next_cursor
         })
     except Exception as e:
-        print(f"获取电影错误: {str(e)}")
+        logger.exception('获取电影错误')
         return jsonify({
             'status': 'error',
             'message': f'获取电影失败: {str(e)}'
@@ -80,78 +116,139 @@ def search_movies():
                 }
             })
         
-        # 使用 LIKE 进行模糊搜索
-        movies = Movie.query.filter(
-            db.or_(
-                Movie.title.like(f'%{query}%'),
-                Movie.description.like(f'%{query}%'),
-                Movie.director.like(f'%{query}%'),
-                Movie.movie_type.like(f'%{query}%')
-            )
-        ).all()
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = max(1, min(request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        
+        # 使用内存倒排索引检索并按 BM25 得分排序，索引由后台线程刷新
+        search_index.ensure_fresh()
+        total, hits = search_index.search(query, offset=(page - 1) * page_size, limit=page_size)
+        
+        # 只加载当前页的电影，并保持得分顺序
+        movie_ids = [movie_id for movie_id, _ in hits]
+        movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(movie_ids))} if movie_ids else {}
         
         # 将结果转换为字典列表
-        movies_list = []
-        for movie in movies:
-            movie_dict = {
-                'id': movie.id,
-                'title': movie.title,
-                'description': movie.description,
-                'release_date': movie.release_date.strftime('%Y-%m-%d') if movie.release_date else None,
-                'movie_type': movie.movie_type,
-                'poster_url': movie.poster_url,
-                'director': movie.director,
-                'rating': movie.rating
-            }
-            movies_list.append(movie_dict)
+        movies_list = movie_list_serializer.many(
+            movies[movie_id] for movie_id in movie_ids if movie_id in movies
+        )
         
         return jsonify({
             'status': 'success',
             'data': {
                 'movies': movies_list,
-                'total': len(movies_list)
+                'total': total,
+                'page': page,
+                'page_size': page_size
             }
         })
+    except IndexNotReady:
+        raise
     except Exception as e:
-        print(f"搜索电影错误: {str(e)}")
+        logger.exception('搜索电影错误')
         return jsonify({
             'status': 'error',
             'message': f'搜索失败: {str(e)}'
         }), 500 
 
+@movies_bp.route('/movies/export', methods=['GET'])
+def export_movies():
+    """按 id 顺序流式导出全部电影，format=ndjson|csv，fields= 选择字段"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f'不支持的导出格式: {fmt}'
+        }), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), movie_serializer.names)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        rows = db.session.query(*[getattr(Movie, name) for name in fields]) \
+            .order_by(Movie.id).yield_per(EXPORT_BATCH_SIZE)
+        return export_response(rows, movie_serializer.only(fields), fmt, 'movies')
+    except Exception as e:
+        logger.exception('导出电影错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'导出电影失败: {str(e)}'
+        }), 500
+
+def load_movie_detail(movie_id):
+    """查询电影详情，电影不存在时返回 None"""
+    movie = Movie.query.get(movie_id)
+    if not movie:
+        return None
+    
+    return {
+        'status': 'success',
+        'data': movie_serializer.one(movie)
+    }
+
 @movies_bp.route('/movies/<int:movie_id>', methods=['GET'])
 def get_movie_detail(movie_id):
     try:
-        # 查询电影详情
-        movie = Movie.query.get(movie_id)
+        response = cache.json_response(f'movie:{movie_id}', 'detail', lambda: load_movie_detail(movie_id))
         
-        if not movie:
+        if response is None:
             return jsonify({
                 'status': 'error',
                 'message': '电影不存在'
             }), 404
         
-        # 将电影信息转换为字典
-        movie_dict = {
-            'id': movie.id,
-            'title': movie.title,
-            'description': movie.description,
-            'release_date': movie.release_date.strftime('%Y-%m-%d') if movie.release_date else None,
-            'movie_type': movie.movie_type,
-            'poster_url': movie.poster_url,
-            'director': movie.director,
-            'rating': movie.rating,
-            'created_at': movie.created_at.strftime('%Y-%m-%d %H:%M:%S') if movie.created_at else None,
-            'updated_at': movie.updated_at.strftime('%Y-%m-%d %H:%M:%S') if movie.updated_at else None
-        }
-        
-        return jsonify({
-            'status': 'success',
-            'data': movie_dict
-        })
+        return response
     except Exception as e:
-        print(f"获取电影详情错误: {str(e)}")
+        logger.exception('获取电影详情错误')
         return jsonify({
             'status': 'error',
             'message': f'获取电影详情失败: {str(e)}'
-        }), 500 
\ No newline at end of file
+        }), 500
+
+def load_similar_movies(movie_id, limit):
+    """查询相似电影，电影不存在时返回 None"""
+    hits = similar_index.similar(movie_id, limit)
+    if hits is None:
+        return None
+    
+    movie_ids = [hit_id for hit_id, _ in hits]
+    movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(movie_ids))} if movie_ids else {}
+    similar_list = []
+    for hit_id, score in hits:
+        if hit_id in movies:
+            movie_dict = movie_list_serializer.one(movies[hit_id])
+            movie_dict['similarity'] = round(score, 4)
+            similar_list.append(movie_dict)
+    
+    return {
+        'status': 'success',
+        'data': similar_list
+    }
+
+@movies_bp.route('/movies/<int:movie_id>/similar', methods=['GET'])
+def get_similar_movies(movie_id):
+    try:
+        limit = max(1, min(request.args.get('limit', 10, type=int), MAX_SIMILAR))
+        response = cache.json_response(
+            f'movie:{movie_id}', f'similar:{limit}',
+            lambda: load_similar_movies(movie_id, limit), SIMILAR_CACHE_TTL
+        )
+        
+        if response is None:
+            return jsonify({
+                'status': 'error',
+                'message': '电影不存在'
+            }), 404
+        
+        return response
+    except IndexNotReady:
+        raise
+    except Exception as e:
+        logger.exception('获取相似电影错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'获取相似电影失败: {str(e)}'
+        }), 500
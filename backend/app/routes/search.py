@@ -1,90 +1,91 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from app.models.search_history import SearchHistory
-from app.models.movie_ranking import MovieRanking
-from app.models.movie import Movie
-from app.extensions import db
-from datetime import datetime, timedelta
+from app.extensions import db, cache
+from app.services.rankings import PERIODS, TOP_N, rankings
+from app.services.search_history import search_history_store
+from app.services.suggest import suggester
 
 bp = Blueprint('search', __name__)
 
+@bp.route('/search/suggest', methods=['GET'])
+def get_search_suggestions():
+    prefix = request.args.get('prefix', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 20))
+    if not prefix.strip():
+        return jsonify({'status': 'success', 'data': []})
+    
+    suggester.ensure_fresh()
+    return jsonify({
+        'status': 'success',
+        'data': suggester.suggest(prefix, limit)
+    })
+
 @bp.route('/search/history', methods=['GET'])
 def get_search_history():
-    user_id = request.args.get('user_id')
+    user_id = request.args.get('user_id', type=int)
     if not user_id:
         return jsonify({'status': 'error', 'message': '用户ID不能为空'}), 400
     
-    # 获取最近7天的搜索记录
-    recent_history = SearchHistory.query.filter(
-        SearchHistory.user_id == user_id,
-        SearchHistory.created_at >= datetime.utcnow() - timedelta(days=7)
-    ).order_by(SearchHistory.created_at.desc()).limit(8).all()
-    
+    # 最近7天内的搜索，从进程内缓存读取
     return jsonify({
         'status': 'success',
-        'data': [history.to_dict() for history in recent_history]
+        'data': search_history_store.recent(user_id)
     })
 
 @bp.route('/search/history', methods=['POST'])
 def add_search_history():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     user_id = data.get('user_id')
     search_query = data.get('search_query')
+    if isinstance(search_query, str):
+        search_query = search_query.strip()[:255]
     
-    if not user_id or not search_query:
+    # 只有空白的搜索词去掉首尾空白后为空，同样视为缺少参数
+    if not user_id or not search_query or not isinstance(search_query, str):
         return jsonify({'status': 'error', 'message': '参数不完整'}), 400
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': '用户ID无效'}), 400
     
-    # 检查是否存在相同的搜索记录
-    existing_history = SearchHistory.query.filter_by(
-        user_id=user_id,
-        search_query=search_query
-    ).first()
-    
-    if existing_history:
-        # 如果存在，更新创建时间
-        existing_history.created_at = datetime.utcnow()
-        db.session.commit()
-        return jsonify({'status': 'success', 'message': '搜索记录已更新'})
-    
-    # 如果不存在，创建新记录
-    history = SearchHistory(
-        user_id=user_id,
-        search_query=search_query
-    )
-    db.session.add(history)
-    db.session.commit()
+    # 写入缓冲区，已有的相同搜索词只更新时间
+    search_history_store.add(user_id, search_query)
     
     return jsonify({'status': 'success', 'message': '搜索记录已添加'})
 
 @bp.route('/search/history/<int:history_id>', methods=['DELETE'])
 def delete_search_history(history_id):
-    history = SearchHistory.query.get_or_404(history_id)
-    db.session.delete(history)
-    db.session.commit()
+    history = db.session.get(SearchHistory, history_id)
+    if history is not None:
+        search_history_store.remove(history.user_id, history.search_query)
+    else:
+        # 尚未写入数据库的记录没有 id，按用户和搜索词删除
+        user_id = request.args.get('user_id', type=int)
+        search_query = request.args.get('search_query')
+        if not user_id or not search_query or not search_history_store.remove(user_id, search_query):
+            abort(404)
     return jsonify({'status': 'success', 'message': '搜索记录已删除'})
 
 @bp.route('/search/history/clear', methods=['DELETE'])
 def clear_search_history():
-    user_id = request.args.get('user_id')
+    user_id = request.args.get('user_id', type=int)
     if not user_id:
         return jsonify({'status': 'error', 'message': '用户ID不能为空'}), 400
     
-    # 删除指定用户的所有搜索历史
-    SearchHistory.query.filter_by(user_id=user_id).delete()
-    db.session.commit()
+    # 删除指定用户的所有搜索历史，包括尚未写入的
+    search_history_store.clear(user_id)
     
     return jsonify({'status': 'success', 'message': '搜索历史已清空'})
 
 @bp.route('/search/rankings', methods=['GET'])
 def get_movie_rankings():
-    rankings = MovieRanking.query.order_by(MovieRanking.rank.asc()).limit(8).all()
-    
-    # 添加调试信息
-    print("电影排名列表:")
-    for rank in rankings:
-        movie_info = rank.movie.to_dict() if rank.movie else None
-        print(f"ID: {rank.id}, 电影ID: {rank.movie_id}, 排名: {rank.rank}, 电影名: {movie_info['title'] if movie_info else 'None'}")
+    period = request.args.get('period', 'all')
+    if period not in PERIODS:
+        return jsonify({'status': 'error', 'message': f'不支持的榜单周期: {period}'}), 400
+    limit = max(1, min(request.args.get('limit', 8, type=int), TOP_N))
     
-    return jsonify({
+    # 榜单由后台任务预先计算，这里直接读取快照
+    return cache.json_response('rankings', f'{period}:{limit}', lambda: {
         'status': 'success',
-        'data': [ranking.to_dict() for ranking in rankings]
-    }) 
\ No newline at end of file
+        'data': rankings.top(period, limit)
+    })
@@ -1,45 +1,37 @@
-from flask import Blueprint, jsonify, request, current_app
+import logging
+from flask import Blueprint, jsonify, request
 from ..models.user import User
 from ..models.history import WatchHistory
+from ..models.favorite import Favorite
 from ..extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
+from ..services.auth import create_token, current_user_id
+from ..services.avatars import InvalidAvatar, avatar_store
+from ..services.favorites import MAX_CHECK_IDS, favorite_store
+from ..services.passwords import password_hasher
+from ..services.progress import progress_buffer
+from ..services.recommendations import TOP_N, recommendations
+from ..utils.pagination import encode_cursor, parse_page_args
+from ..utils.serializer import EXPORT_FORMATS, export_response, favorite_serializer, history_serializer
+from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime
 
 user_bp = Blueprint('user', __name__)
+logger = logging.getLogger(__name__)
 
 @user_bp.route('/api/users/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
     try:
-        # 验证身份
-        jwt_identity = get_jwt_identity()
-        try:
-            jwt_identity = int(jwt_identity)
-            user_id = int(user_id)
-        except (ValueError, TypeError):
-            return jsonify({
-                'status': 'error',
-                'message': '无效的用户ID'
-            }), 400
-        
-        if jwt_identity != user_id:
+        # 验证身份，当前用户已在校验令牌时从缓存中取得
+        if current_user.id != user_id:
             return jsonify({
                 'status': 'error',
                 'message': '无权访问此用户信息'
             }), 403
             
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': '用户不存在'
-            }), 404
-            
         return jsonify({
             'status': 'success',
-            'data': user.to_dict()
+            'data': current_user.to_dict()
         })
     except Exception as e:
         return jsonify({
@@ -59,9 +51,7 @@ def get_user_by_params():
             }), 400
             
         # 验证身份
-        jwt_identity = get_jwt_identity()
         try:
-            jwt_identity = int(jwt_identity)
             user_id = int(user_id)
         except (ValueError, TypeError):
             if 'DEV' in request.headers.get('User-Agent', ''):
@@ -73,31 +63,13 @@ def get_user_by_params():
                     'message': '无效的用户ID'
                 }), 400
         
-        if jwt_identity != user_id:
+        if current_user.id != user_id:
             return jsonify({
                 'status': 'error',
                 'message': '无权访问此用户信息'
             }), 403
             
-        user = User.query.get(user_id)
-        if not user:
-            if 'DEV' in request.headers.get('User-Agent', ''):
-                # 开发环境返回模拟数据
-                return jsonify({
-                    'status': 'success',
-                    'data': {
-                        'id': user_id,
-                        'username': '测试用户',
-                        'email': 'test@example.com',
-                        'created_at': datetime.now().isoformat(),
-                        'avatar': ''
-                    }
-                })
-            return jsonify({
-                'status': 'error',
-                'message': '用户不存在'
-            }), 404
-            
+        user = current_user
         return jsonify({
             'status': 'success',
             'data': {
@@ -130,19 +102,9 @@ def get_user_by_params():
 @jwt_required()
 def get_user_profile():
     try:
-        # 从JWT获取用户ID
-        user_id = get_jwt_identity()
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': '用户不存在'
-            }), 404
-            
         return jsonify({
             'status': 'success',
-            'data': user.to_dict()
+            'data': current_user.to_dict()
         })
     except Exception as e:
         return jsonify({
@@ -167,35 +129,36 @@ def upload_avatar():
         }), 400
         
     # 获取用户ID
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({
             'status': 'error',
             'message': '用户不存在'
         }), 404
     
-    # 确保上传目录存在
-    upload_folder = os.path.join(current_app.root_path, 'static', 'avatars')
-    os.makedirs(upload_folder, exist_ok=True)
-    
-    # 保存文件
-    filename = f"user_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-    file_path = os.path.join(upload_folder, filename)
-    file.save(file_path)
+    # 校验图片后生成各尺寸的缩略图，文件按内容哈希命名，相同图片只保存一份
+    try:
+        avatar_relative_url = avatar_store.store(avatar_store.read_upload(file))
+    except InvalidAvatar as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     
     # 更新用户头像URL - 使用相对路径存储
-    avatar_relative_url = f"/static/avatars/{filename}"
+    old_avatar = user.avatar
     user.avatar = avatar_relative_url
     db.session.commit()
+    if old_avatar != avatar_relative_url:
+        avatar_store.release(old_avatar)
     
     # 构建完整URL以返回给前端
     # 从请求中获取主机和协议
     host = request.host_url.rstrip('/')
     avatar_full_url = f"{host}{avatar_relative_url}"
     
-    print(f"头像保存成功: {file_path}")
-    print(f"头像URL: {avatar_full_url}")
+    logger.info('头像保存成功', extra={'user_id': user_id, 'avatar': avatar_relative_url})
     
     return jsonify({
         'status': 'success',
@@ -215,8 +178,8 @@ def update_username():
         }), 400
         
     # 获取用户ID
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({
             'status': 'error',
@@ -252,8 +215,8 @@ def change_password():
         }), 400
         
     # 获取用户ID
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user_id = current_user_id()
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({
             'status': 'error',
@@ -261,44 +224,219 @@ def change_password():
         }), 404
     
     # 验证当前密码
-    if not check_password_hash(user.password_hash, data['current_password']):
+    if not password_hasher.verify(user.password_hash, data['current_password']):
         return jsonify({
             'status': 'error',
             'message': '当前密码不正确'
         }), 400
     
     # 更新密码
-    user.password_hash = generate_password_hash(data['new_password'])
+    user.set_password(data['new_password'])
     db.session.commit()
     
+    # 令牌中带有密码指纹，修改后其他设备上的旧令牌失效，当前设备换用新令牌
     return jsonify({
         'status': 'success',
-        'message': '密码修改成功'
+        'message': '密码修改成功',
+        'token': create_token(user)
     })
 
 @user_bp.route('/api/user/history', methods=['GET'])
 @jwt_required()
 def get_user_history():
     # 获取用户ID
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
+    
+    try:
+        limit, cursor = parse_page_args(request.args, default_limit=50, parse_value=datetime.fromisoformat)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    # 先写入缓冲中尚未落库的进度
+    if progress_buffer.has_pending(user_id):
+        progress_buffer.flush()
+    
+    # 获取用户观看历史，电影信息在同一条查询中联表取回
+    rows, has_more = WatchHistory.page_for_user(user_id, limit, cursor)
+    
+    history_data = history_serializer.many(rows)
+    for item in history_data:
+        if item['title'] is None:
+            item['title'] = '未知电影'
+        item['poster_url'] = item['poster_url'] or ''
+    
+    next_cursor = encode_cursor(rows[-1].watch_time, rows[-1].id) if has_more else None
+    
+    return jsonify({
+        'status': 'success',
+        'data': history_data,
+        'next_cursor': next_cursor
+    })
+
+@user_bp.route('/api/user/history/export', methods=['GET'])
+@jwt_required()
+def export_user_history():
+    """按观看时间倒序流式导出当前用户的全部历史，format=ndjson|csv"""
+    user_id = current_user_id()
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f'不支持的导出格式: {fmt}'
+        }), 400
+    
+    try:
+        if progress_buffer.has_pending(user_id):
+            progress_buffer.flush()
+        
+        rows = WatchHistory.query_for_user(user_id) \
+            .order_by(WatchHistory.watch_time.desc(), WatchHistory.id.desc()) \
+            .yield_per(1000)
+        return export_response(rows, history_serializer, fmt, 'history')
+    except Exception as e:
+        logger.exception('导出观看历史错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'导出观看历史失败: {str(e)}'
+        }), 500
+
+@user_bp.route('/api/user/recommendations', methods=['GET'])
+@jwt_required()
+def get_user_recommendations():
+    """个性化推荐，由后台任务预先计算；没有观看记录的用户返回热门电影"""
+    user_id = current_user_id()
+    limit = max(1, min(request.args.get('limit', 20, type=int), TOP_N))
+    
+    try:
+        source, movies = recommendations.for_user(user_id, limit)
+        return jsonify({
+            'status': 'success',
+            'source': source,
+            'data': movies
+        })
+    except Exception as e:
+        logger.exception('获取个性化推荐错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'获取推荐失败: {str(e)}'
+        }), 500
+
+@user_bp.route('/api/user/favorites', methods=['GET'])
+@jwt_required()
+def get_user_favorites():
+    """按收藏时间倒序分页返回收藏的电影"""
+    user_id = current_user_id()
+    
+    try:
+        limit, cursor = parse_page_args(request.args, default_limit=50, parse_value=datetime.fromisoformat)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    rows, has_more = Favorite.page_for_user(user_id, limit, cursor)
+    next_cursor = encode_cursor(rows[-1].add_time, rows[-1].id) if has_more else None
+    
+    return jsonify({
+        'status': 'success',
+        'data': favorite_serializer.many(rows),
+        'next_cursor': next_cursor
+    })
+
+@user_bp.route('/api/user/favorites', methods=['POST'])
+@jwt_required()
+def add_user_favorite():
+    user_id = current_user_id()
+    data = request.get_json(silent=True) or {}
+    try:
+        movie_id = int(data.get('movie_id'))
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': '缺少电影ID'
+        }), 400
     
-    # 获取用户观看历史
-    history = WatchHistory.query.filter_by(user_id=user_id).order_by(WatchHistory.watch_time.desc()).all()
+    if not progress_buffer.movie_exists(movie_id):
+        return jsonify({
+            'status': 'error',
+            'message': '电影不存在'
+        }), 404
     
-    history_data = []
-    for item in history:
-        history_data.append({
-            'id': item.id,
-            'movie_id': item.movie_id,
-            'title': item.movie.title if item.movie else '未知电影',
-            'poster_url': item.movie.poster_url if item.movie else '',
-            'watch_time': item.watch_time.isoformat(),
-            'progress': item.progress
+    try:
+        added = favorite_store.add(user_id, movie_id)
+        return jsonify({
+            'status': 'success',
+            'message': '收藏成功' if added else '已在收藏中'
         })
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('添加收藏错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'添加收藏失败: {str(e)}'
+        }), 500
+
+@user_bp.route('/api/user/favorites/<int:movie_id>', methods=['DELETE'])
+@jwt_required()
+def remove_user_favorite(movie_id):
+    user_id = current_user_id()
+    try:
+        removed = favorite_store.remove(user_id, movie_id)
+        return jsonify({
+            'status': 'success',
+            'message': '已取消收藏' if removed else '未收藏该电影'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('取消收藏错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'取消收藏失败: {str(e)}'
+        }), 500
+
+@user_bp.route('/api/user/favorites/clear', methods=['DELETE'])
+@jwt_required()
+def clear_user_favorites():
+    user_id = current_user_id()
+    try:
+        count = favorite_store.clear(user_id)
+        return jsonify({
+            'status': 'success',
+            'message': f'已清空 {count} 部收藏'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('清空收藏错误')
+        return jsonify({
+            'status': 'error',
+            'message': f'清空收藏失败: {str(e)}'
+        }), 500
+
+@user_bp.route('/api/user/favorites/check', methods=['GET'])
+@jwt_required()
+def check_user_favorites():
+    """ids=1,2,3 中已收藏的电影 id，列表页一次请求取回所有卡片的收藏状态"""
+    user_id = current_user_id()
+    try:
+        movie_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': '无效的电影ID'
+        }), 400
+    if len(movie_ids) > MAX_CHECK_IDS:
+        return jsonify({
+            'status': 'error',
+            'message': f'一次最多查询 {MAX_CHECK_IDS} 部电影'
+        }), 400
     
     return jsonify({
         'status': 'success',
-        'data': history_data
+        'data': favorite_store.filter(user_id, movie_ids)
     })
 
 @user_bp.route('/api/user/verify-email', methods=['POST'])
@@ -311,17 +449,8 @@ def verify_email():
             'message': '未提供邮箱'
         }), 400
         
-    # 获取用户ID
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({
-            'status': 'error',
-            'message': '用户不存在'
-        }), 404
-    
     # 验证邮箱是否匹配
-    if user.email != data['email']:
+    if current_user.email != data['email']:
         return jsonify({
             'status': 'error',
             'message': '邮箱与账号不匹配'
@@ -0,0 +1,180 @@
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from flask import jsonify
+from flask_jwt_extended import create_access_token, current_user
+
+from app.extensions import cache, db
+from app.models.user import User
+from app.utils.serializer import user_serializer
+
+TOKEN_EXPIRES = timedelta(days=1)
+
+
+def password_fingerprint(user):
+    """写入令牌的密码指纹，修改密码后旧令牌的指纹不再匹配
+
+    由修改密码的时间计算，登录时重新哈希不改变指纹；没有该时间的用户（迁移前直接
+    写入数据库的行）退回到由哈希值计算。
+    """
+    if user.password_changed_at is not None:
+        source = user.password_changed_at.isoformat()
+    else:
+        source = user.password_hash
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+
+
+def save_rehashed_password(app, user_id, old_hash, new_hash):
+    """保存后台重新计算的哈希，期间密码已被修改时放弃"""
+    with app.app_context():
+        try:
+            count = User.query.filter_by(id=user_id, password_hash=old_hash) \
+                .update({'password_hash': new_hash}, synchronize_session=False)
+            db.session.commit()
+            if count:
+                # 批量更新不触发模型事件，手动使缓存失效
+                cache.invalidate(f'user:{user_id}')
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+
+def create_token(user):
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={'pwd': password_fingerprint(user)},
+        expires_delta=TOKEN_EXPIRES
+    )
+
+
+def current_user_id():
+    """当前请求的用户 id（int），只能在 jwt_required 的视图中调用"""
+    return current_user.id
+
+
+class UserSnapshot:
+    """缓存的用户只读副本，字段与 User 相同，修改用户时需要重新查询 User"""
+
+    __slots__ = user_serializer.names + ('password_fingerprint', 'version', 'expires_at')
+
+    def __init__(self, user, version, expires_at):
+        for name in user_serializer.names:
+            setattr(self, name, getattr(user, name))
+        self.password_fingerprint = password_fingerprint(user)
+        self.version = version
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return user_serializer.one(self)
+
+
+class AuthState:
+    """JWT 校验的快速路径
+
+    user_lookup_loader 按用户 id 读取进程内缓存的 UserSnapshot，缓存与共享缓存中
+    user:<id> 命名空间的版本号绑定（用户有修改时递增），并且最多保留
+    AUTH_USER_CACHE_TTL 秒。注销的令牌 jti 记录在内存中，过期后移除；使用 redis
+    缓存时同时写入 redis，让其他进程也能看到。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> UserSnapshot
+        self._max_users = 10000
+        self._ttl = 30
+        self._revoked = {}           # jti -> 过期时间戳
+        self._revoked_heap = []      # (过期时间戳, jti)，用于按过期时间清理
+        self._shared = False
+
+    def init_app(self, app, jwt):
+        self._ttl = app.config.get('AUTH_USER_CACHE_TTL', self._ttl)
+        self._max_users = app.config.get('AUTH_USER_CACHE_SIZE', self._max_users)
+        self._shared = app.config.get('CACHE_BACKEND') == 'redis'
+        cache.watch(User, lambda user: [f'user:{user.id}'])
+
+        jwt.user_lookup_loader(self._lookup)
+        jwt.token_in_blocklist_loader(self._is_revoked)
+        jwt.user_lookup_error_loader(self._lookup_error)
+        jwt.revoked_token_loader(self._revoked_error)
+
+    # ---- 用户 ----
+
+    def get_user(self, user_id):
+        version = cache.version(f'user:{user_id}')
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._users.get(user_id)
+            if snapshot is not None and snapshot.version == version and snapshot.expires_at > now:
+                self._users.move_to_end(user_id)
+                return snapshot
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user, version, now + self._ttl)
+        with self._lock:
+            self._users[user_id] = snapshot
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._max_users:
+                self._users.popitem(last=False)
+        return snapshot
+
+    def _lookup(self, jwt_header, jwt_data):
+        try:
+            user_id = int(jwt_data['sub'])
+        except (TypeError, ValueError):
+            return None
+        user = self.get_user(user_id)
+        if user is None:
+            return None
+        # 旧版本签发的令牌没有 pwd，不做检查
+        fingerprint = jwt_data.get('pwd')
+        if fingerprint is not None and fingerprint != user.password_fingerprint:
+            return None
+        return user
+
+    def _lookup_error(self, jwt_header, jwt_data):
+        return jsonify({
+            'status': 'error',
+            'message': '用户不存在或密码已修改，请重新登录'
+        }), 401
+
+    # ---- 注销 ----
+
+    def revoke(self, jwt_data):
+        """注销令牌，直到它自然过期"""
+        jti, expires_at = jwt_data['jti'], jwt_data['exp']
+        now = time.time()
+        with self._lock:
+            self._revoked[jti] = expires_at
+            heapq.heappush(self._revoked_heap, (expires_at, jti))
+            self._evict(now)
+        if self._shared:
+            cache.backend.set(f'revoked:{jti}', 1, max(1, int(expires_at - now)))
+
+    def _evict(self, now):
+        heap = self._revoked_heap
+        while heap and heap[0][0] <= now:
+            _, jti = heapq.heappop(heap)
+            self._revoked.pop(jti, None)
+
+    def _is_revoked(self, jwt_header, jwt_data):
+        jti = jwt_data.get('jti')
+        if jti in self._revoked:
+            return True
+        return self._shared and cache.backend.get(f'revoked:{jti}') is not None
+
+    def _revoked_error(self, jwt_header, jwt_data):
+        return jsonify({
+            'status': 'error',
+            'message': '登录已失效，请重新登录'
+        }), 401
+
+
+auth_state = AuthState()
@@ -0,0 +1,231 @@
+import hashlib
+import io
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import click
+from flask import jsonify
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.extensions import db
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# 生成的边长和格式，User.avatar 保存 DEFAULT_SIZE 的 png 地址，其余变体按命名规则推出
+SIZES = (64, 128, 256)
+FORMATS = ('webp', 'png')
+DEFAULT_SIZE = 256
+# 允许上传的原图格式
+ALLOWED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP', 'BMP'}
+# 内容哈希取前 16 个十六进制字符作为文件名
+HASH_LENGTH = 16
+
+# 刚被复用的文件在这段时间内不会被回收，避免与并发上传相同内容的请求冲突
+REUSE_GRACE = 60
+
+URL_PREFIX = '/static/avatars/'
+_VARIANT_NAME = re.compile(r'^([0-9a-f]{%d})-(\d+)\.(\w+)$' % HASH_LENGTH)
+
+
+class InvalidAvatar(ValueError):
+    pass
+
+
+class AvatarBusy(Exception):
+    """处理线程池繁忙，头像未能在 AVATAR_PROCESS_TIMEOUT 内处理完成"""
+
+
+def variant_name(digest, size, fmt):
+    return f'{digest}-{size}.{fmt}'
+
+
+def avatar_url(digest, size=DEFAULT_SIZE, fmt='png'):
+    return URL_PREFIX + variant_name(digest, size, fmt)
+
+
+def _digest_of(url):
+    """头像地址对应的内容哈希，旧的按用户命名的文件返回 None"""
+    match = _VARIANT_NAME.match(os.path.basename(url or ''))
+    return match.group(1) if match else None
+
+
+def render_variants(data):
+    """解码原图并生成所有尺寸和格式，返回 {(边长, 格式): 字节}"""
+    image = Image.open(io.BytesIO(data))
+    # JPEG 在解码时直接按 1/2、1/4、1/8 缩小，大图只解码需要的像素
+    image.draft('RGB', (max(SIZES) * 2, max(SIZES) * 2))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA')
+
+    variants = {}
+    for size in sorted(SIZES, reverse=True):
+        # 每一级从上一级缩放，比每次从原图缩放快
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for fmt in FORMATS:
+            buffer = io.BytesIO()
+            if fmt == 'webp':
+                image.save(buffer, 'WEBP', quality=85, method=4)
+            else:
+                image.save(buffer, 'PNG', optimize=True)
+            variants[(size, fmt)] = buffer.getvalue()
+    return variants
+
+
+class AvatarStore:
+    """头像处理: 校验、按内容哈希去重、生成缩略图、回收不再使用的文件
+
+    请求线程只读取上传内容并检查图片头；解码和缩放在有界线程池中执行，
+    同时处理的头像数不超过 AVATAR_WORKERS，大图不会占满所有请求线程的内存。
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._folder = None
+        self._max_bytes = 5 * 1024 * 1024
+        self._max_pixels = 40_000_000
+        self._timeout = 30
+
+    def init_app(self, app):
+        self._folder = os.path.join(app.root_path, 'static', 'avatars')
+        os.makedirs(self._folder, exist_ok=True)
+        self._max_bytes = app.config.get('AVATAR_MAX_BYTES', self._max_bytes)
+        self._max_pixels = app.config.get('AVATAR_MAX_PIXELS', self._max_pixels)
+        self._timeout = app.config.get('AVATAR_PROCESS_TIMEOUT', self._timeout)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get('AVATAR_WORKERS', 2), thread_name_prefix='avatar'
+            )
+
+        @app.cli.command('avatars-gc')
+        @click.option('--min-age', default=3600, show_default=True, help='只删除早于该秒数的文件')
+        def avatars_gc_command(min_age):
+            """删除没有用户引用的头像文件"""
+            click.echo(f'已删除 {self.collect_garbage(min_age)} 个文件')
+
+        app.register_error_handler(AvatarBusy, self._busy_response)
+
+    def _busy_response(self, e):
+        response = jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, math.ceil(self._timeout)))
+        return response
+
+    def _path(self, name):
+        return os.path.join(self._folder, name)
+
+    def read_upload(self, file):
+        """读取上传文件并校验大小、格式和尺寸，返回原始字节"""
+        data = file.read(self._max_bytes + 1)
+        if not data:
+            raise InvalidAvatar('文件为空')
+        if len(data) > self._max_bytes:
+            raise InvalidAvatar(f'头像文件不能超过 {self._max_bytes // (1024 * 1024)}MB')
+        try:
+            # 只读取文件头，不解码像素
+            image = Image.open(io.BytesIO(data))
+        except Image.DecompressionBombError:
+            # 像素数超过 Pillow 上限两倍时在读取文件头时就会拒绝
+            raise InvalidAvatar('图片尺寸过大')
+        except (UnidentifiedImageError, OSError):
+            raise InvalidAvatar('无法识别的图片文件')
+        if image.format not in ALLOWED_FORMATS:
+            raise InvalidAvatar(f'不支持的图片格式: {image.format}')
+        width, height = image.size
+        if width * height > self._max_pixels:
+            raise InvalidAvatar('图片尺寸过大')
+        return data
+
+    def _write(self, digest, data):
+        variants = render_variants(data)
+        for (size, fmt), content in variants.items():
+            path = self._path(variant_name(digest, size, fmt))
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            # 原子替换，读取方不会看到写了一半的文件
+            os.replace(tmp_path, path)
+
+    def store(self, data):
+        """保存头像并返回默认尺寸的地址，相同内容只处理一次"""
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        paths = [self._path(variant_name(digest, size, fmt)) for size in SIZES for fmt in FORMATS]
+        if all(os.path.exists(path) for path in paths):
+            # 已有相同内容的头像，更新修改时间防止被并发的回收删除
+            os.utime(paths[0])
+        else:
+            future = self._executor.submit(self._write, digest, data)
+            try:
+                future.result(self._timeout)
+            except TimeoutError:
+                # 仍在排队时取消，已开始处理的在后台完成，下次上传相同内容时直接复用
+                future.cancel()
+                raise AvatarBusy('头像处理繁忙，请稍后重试')
+            except Image.DecompressionBombError:
+                raise InvalidAvatar('图片尺寸过大')
+            except (UnidentifiedImageError, OSError) as e:
+                raise InvalidAvatar(f'图片解码失败: {e}')
+        return avatar_url(digest)
+
+    def release(self, url):
+        """头像被替换后，没有其他用户引用时在后台删除其文件"""
+        if not url or not url.startswith(URL_PREFIX):
+            return
+        if db.session.query(User.id).filter_by(avatar=url).first() is not None:
+            return
+        self._executor.submit(self._remove, url)
+
+    def _remove(self, url):
+        digest = _digest_of(url)
+        if digest is None:
+            names = [os.path.basename(url)]
+        else:
+            names = [variant_name(digest, size, fmt) for size in SIZES for fmt in FORMATS]
+            try:
+                if os.path.getmtime(self._path(names[0])) > time.time() - REUSE_GRACE:
+                    return
+            except OSError:
+                return
+        for name in names:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception('删除头像文件失败', extra={'file': name})
+
+    def collect_garbage(self, min_age=3600):
+        """删除目录中没有用户引用的文件，跳过 min_age 秒内写入的文件（可能正在上传）"""
+        referenced_names, referenced_digests = set(), set()
+        for (url,) in db.session.query(User.avatar).filter(User.avatar.like(URL_PREFIX + '%')):
+            referenced_names.add(os.path.basename(url))
+            digest = _digest_of(url)
+            if digest is not None:
+                referenced_digests.add(digest)
+
+        cutoff = time.time() - min_age
+        removed = 0
+        with os.scandir(self._folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name in referenced_names:
+                    continue
+                match = _VARIANT_NAME.match(entry.name)
+                if match and match.group(1) in referenced_digests:
+                    continue
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                os.remove(entry.path)
+                removed += 1
+        logger.info('头像文件回收完成', extra={'removed': removed})
+        return removed
+
+
+avatar_store = AvatarStore()
@@ -0,0 +1,62 @@
+import threading
+
+from flask import jsonify
+
+
+class IndexNotReady(Exception):
+    """后台线程尚未完成首次构建，返回 503，retry_after 为建议的重试间隔（秒）"""
+
+    def __init__(self, message, retry_after=30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackgroundTasks:
+    """后台线程的延迟启动
+
+    create_app 不只在 web worker 中执行，flask db upgrade 等 CLI 命令、werkzeug
+    重载器的父进程以及推荐计算的 multiprocessing 子进程都会调用它。这些进程不处理
+    请求，不应该启动索引刷新、批量写入等后台线程，因此各服务在 init_app 中只登记
+    启动函数，进程收到第一个请求时才统一启动。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starters = []
+        self._started = False
+
+    def init_app(self, app):
+        app.before_request(self.start)
+        app.register_error_handler(IndexNotReady, self._not_ready_response)
+
+    @staticmethod
+    def _not_ready_response(e):
+        response = jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+    def register(self, starter):
+        """登记启动函数，进程已在处理请求时立即启动"""
+        with self._lock:
+            self._starters.append(starter)
+            started = self._started
+        if started:
+            starter()
+
+    def start(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            starters = list(self._starters)
+        for starter in starters:
+            starter()
+
+
+background_tasks = BackgroundTasks()
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryBackend:
+    """进程内 LRU + TTL 缓存，多 worker 部署时各进程独立失效"""
+
+    def __init__(self, max_entries=1024):
+        self._max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+
+class RedisBackend:
+    """Redis 兼容的共享缓存，需要安装 redis 包"""
+
+    def __init__(self, url, prefix='movie:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, json.dumps(value), ex=int(ttl))
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def get_counter(self, key):
+        return int(self._client.get(self._prefix + key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(self._prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class Cache:
+    """带版本号的读穿缓存
+
+    每个命名空间（如 'categories'、'movie:12'）有独立版本号，写入时递增版本号
+    即可让旧数据全部失效，无需逐个删除键。缓存的值是序列化好的 JSON 响应体及
+    其强 ETag，命中时直接返回，If-None-Match 匹配则返回 304。
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 300
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        app.extensions['cache'] = self
+
+    def version(self, namespace):
+        """命名空间当前的版本号，进程内缓存可以用它判断数据是否已过期"""
+        return self.backend.get_counter(f'version:{namespace}')
+
+    def _key(self, namespace, key):
+        return f'{namespace}:{self.version(namespace)}:{key}'
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.incr(f'version:{namespace}')
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """读取缓存，未命中时调用 loader 生成数据；loader 返回 None 时不缓存"""
+        cache_key = self._key(namespace, key)
+        entry = self.backend.get(cache_key)
+        if entry is None:
+            payload = loader()
+            if payload is None:
+                return None
+            body = current_app.json.dumps(payload)
+            entry = {
+                'body': body,
+                'etag': hashlib.sha1(body.encode('utf-8')).hexdigest()
+            }
+            self.backend.set(cache_key, entry, ttl or self.default_ttl)
+        return entry
+
+    def json_response(self, namespace, key, loader, ttl=None):
+        """返回带 ETag 的 JSON 响应，客户端缓存仍有效时返回 304"""
+        entry = self.get_or_set(namespace, key, loader, ttl)
+        if entry is None:
+            return None
+        if request.if_none_match.contains(entry['etag']):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        return response
+
+    def watch(self, model, namespaces):
+        """模型有增删改时，在事务提交后使 namespaces(obj) 返回的命名空间失效"""
+        def collect(mapper, connection, target):
+            session = Session.object_session(target)
+            if session is not None:
+                session.info.setdefault('cache_invalidate', set()).update(namespaces(target))
+
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, collect)
+
+        if not event.contains(Session, 'after_commit', _invalidate_after_commit):
+            event.listen(Session, 'after_commit', _invalidate_after_commit)
+            event.listen(Session, 'after_rollback', _discard_pending)
+
+
+
+class LocalCache:
+    """进程内按用户等键缓存的数据，LRU 淘汰
+
+    每个条目与共享缓存中 namespace(键) 命名空间的版本号绑定，任一进程写入后版本号
+    递增，其他进程在下次读取时重新加载。内存缓存后端的版本号只在本进程内可见，条目
+    另外在 ttl 秒后过期，多 worker 部署时其他进程的写入最多延迟这么久可见；需要即时
+    一致时使用 redis 缓存后端。
+
+    lock 保护条目，可以与使用方共用一把锁，以便在同一把锁内修改缓存的值。
+    """
+
+    def __init__(self, cache, namespace, lock=None, max_entries=10000, ttl=30):
+        self._cache = cache
+        self._namespace = namespace
+        self._entries = OrderedDict()  # 键 -> (版本号, 过期时间, 值)
+        self.lock = lock or threading.Lock()
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key, load, merge=None):
+        """返回 key 的缓存值，过期或版本号变化时调用 load() 在锁外重新加载
+
+        merge(值) 在锁内、写入缓存之前调用，可用于合并加载期间产生的变化。
+        """
+        version = self._cache.version(self._namespace(key))
+        now = time.monotonic()
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        value = load()
+        with self.lock:
+            if merge is not None:
+                merge(value)
+            self._entries[key] = (version, now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def peek(self, key):
+        """已缓存的值（不检查是否过期），没有时返回 None，调用方需持有 lock"""
+        entry = self._entries.get(key)
+        return entry[2] if entry is not None else None
+
+def _invalidate_after_commit(session):
+    pending = session.info.pop('cache_invalidate', None)
+    if pending:
+        current_app.extensions['cache'].invalidate(*pending)
+
+
+def _discard_pending(session):
+    session.info.pop('cache_invalidate', None)
@@ -0,0 +1,336 @@
+import csv
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+from itertools import islice
+
+import click
+from sqlalchemy import insert
+
+from app.extensions import cache, db
+from app.models.category import Category
+from app.models.movie import Movie
+from app.models.movie_category import movie_category
+from app.utils.upsert import insert_ignore
+
+logger = logging.getLogger(__name__)
+
+MOVIE_COLUMNS = ('id', 'title', 'description', 'release_date', 'movie_type',
+                 'poster_url', 'director', 'rating', 'created_at', 'updated_at')
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d', '%Y-%m', '%Y')
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d %H:%M:%S')
+# 字段长度上限，与 Movie 模型一致
+MAX_LENGTHS = {'title': 100, 'movie_type': 50, 'poster_url': 200, 'director': 100}
+
+_INSERT_RE = re.compile(r'INSERT INTO `?(\w+)`?\s*(?:\(([^)]*)\))?\s*VALUES\s*', re.I)
+_CREATE_RE = re.compile(r'CREATE TABLE `?(\w+)`?', re.I)
+_COLUMN_RE = re.compile(r'^\s*`(\w+)`')
+_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', '0': '\0'}
+
+
+class ImportFailed(Exception):
+    pass
+
+
+# ---- 读取: 每种格式都是逐行读取的生成器，内存占用与文件大小无关 ----
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _parse_values(text):
+    """解析 MySQL VALUES 子句 (..),(..) 中的每一行，返回值列表的生成器"""
+    i, n = 0, len(text)
+    while i < n:
+        if text[i] != '(':
+            i += 1
+            continue
+        i += 1
+        row, token, quoted, was_quoted = [], [], False, False
+        while i < n:
+            ch = text[i]
+            if quoted:
+                if ch == '\\' and i + 1 < n:
+                    token.append(_ESCAPES.get(text[i + 1], text[i + 1]))
+                    i += 2
+                    continue
+                if ch == "'" and text[i + 1:i + 2] == "'":
+                    token.append("'")
+                    i += 2
+                    continue
+                if ch == "'":
+                    quoted = False
+                else:
+                    token.append(ch)
+            elif ch == "'":
+                quoted = was_quoted = True
+            elif ch in ',)':
+                value = ''.join(token)
+                if not was_quoted:
+                    value = value.strip()
+                    value = None if value.upper() == 'NULL' else value
+                row.append(value)
+                token, was_quoted = [], False
+                if ch == ')':
+                    i += 1
+                    break
+            else:
+                token.append(ch)
+            i += 1
+        yield row
+
+
+def read_sql_dump(path, table='movie'):
+    """从 mysqldump 文件中读取指定表的行，列名取自 INSERT 或 CREATE TABLE 语句"""
+    columns, current_table = {}, None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            create = _CREATE_RE.match(line)
+            if create:
+                current_table = create.group(1)
+                columns[current_table] = []
+                continue
+            if current_table and line.startswith('  `'):
+                columns[current_table].append(_COLUMN_RE.match(line).group(1))
+                continue
+            if line.startswith(')'):
+                current_table = None
+                continue
+            insert_match = _INSERT_RE.match(line)
+            if not insert_match or insert_match.group(1) != table:
+                continue
+            names = insert_match.group(2)
+            names = [name.strip(' `') for name in names.split(',')] if names else columns.get(table)
+            if not names:
+                raise ImportFailed(f'无法确定表 {table} 的列名')
+            for values in _parse_values(line[insert_match.end():]):
+                yield dict(zip(names, values))
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+    'sql': read_sql_dump,
+}
+
+
+# ---- 校验与规整 ----
+
+def _parse_date(value, formats):
+    if value in (None, ''):
+        return None
+    if isinstance(value, (date, datetime)):
+        return value
+    value = str(value).strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f'无法解析日期: {value}')
+
+
+def normalize(raw):
+    """把一行原始数据规整为 Movie 列字典，数据无效时抛出 ValueError"""
+    row = {}
+    for column in MOVIE_COLUMNS:
+        value = raw.get(column)
+        if isinstance(value, str):
+            value = value.strip() or None
+        row[column] = value
+
+    if not row['title']:
+        raise ValueError('缺少标题')
+    for column, limit in MAX_LENGTHS.items():
+        if row[column] and len(row[column]) > limit:
+            row[column] = row[column][:limit]
+
+    # 保留源数据中的 id，便于与关联表对应；没有 id 时由数据库自增
+    row['id'] = int(row['id']) if row['id'] is not None else None
+    release = _parse_date(row['release_date'], DATE_FORMATS)
+    row['release_date'] = release.date() if isinstance(release, datetime) else release
+    if row['rating'] is not None:
+        rating = float(row['rating'])
+        if not 0 <= rating <= 10:
+            raise ValueError(f'评分超出范围: {rating}')
+        row['rating'] = round(rating, 1)
+
+    now = datetime.utcnow()
+    row['created_at'] = _parse_date(row['created_at'], DATETIME_FORMATS) or now
+    # updated_at 在写入时统一设为导入时间，见 import_movies
+    row['updated_at'] = now
+    return row
+
+
+def normalized(rows, stats):
+    for raw in rows:
+        try:
+            yield normalize(raw)
+        except (ValueError, TypeError) as e:
+            stats['skipped'] += 1
+            logger.debug('跳过无效行', extra={'error': str(e)})
+
+
+# ---- 写入 ----
+
+def _batches(rows, size):
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _load_checkpoint(path, source):
+    if not path or not os.path.exists(path):
+        return {'source': source, 'consumed': 0, 'inserted': 0, 'skipped': 0}
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('source') != source:
+        raise ImportFailed(f'断点文件属于另一个数据源: {checkpoint.get("source")}')
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _ensure_categories(names, known):
+    """把 movie_type 中出现的新分类写入 category 表"""
+    missing = {name for name in names if name and name not in known}
+    if missing:
+        existing = {name for name, in db.session.query(Category.name).filter(Category.name.in_(missing))}
+        new = missing - existing
+        if new:
+            db.session.execute(insert(Category), [{'name': name, 'description': f'{name}类电影'} for name in new])
+        known.update(missing)
+
+
+def _drop_existing_ids(batch):
+    """去掉源数据 id 已存在或在本批中重复的行，返回 (剩余的行, 去掉的行数)"""
+    ids = {row['id'] for row in batch if row['id'] is not None}
+    if not ids:
+        return batch, 0
+    seen = {movie_id for movie_id, in db.session.query(Movie.id).filter(Movie.id.in_(ids))}
+    kept = []
+    for row in batch:
+        if row['id'] is not None:
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+        kept.append(row)
+    return kept, len(batch) - len(kept)
+
+
+def link_categories(movie_filter=None):
+    """按 movie_type 把电影关联到同名分类，已存在的关联会跳过，返回新增条数"""
+    linked = db.exists().where(
+        movie_category.c.movie_id == Movie.id,
+        movie_category.c.category_id == Category.id
+    )
+    select_stmt = db.select(Movie.id, Category.id) \
+        .join(Category, Category.name == Movie.movie_type) \
+        .where(~linked)
+    if movie_filter is not None:
+        select_stmt = select_stmt.where(movie_filter)
+    result = db.session.execute(
+        movie_category.insert().from_select(['movie_id', 'category_id'], select_stmt)
+    )
+    return result.rowcount
+
+
+def import_movies(path, fmt, batch_size=5000, checkpoint_path=None):
+    """流式导入电影，每批一次 executemany 和一次提交，断点记录已处理的源数据行数"""
+    source = os.path.abspath(path)
+    checkpoint = _load_checkpoint(checkpoint_path, source)
+    stats = {'skipped': 0}
+    known_categories = {name for name, in db.session.query(Category.name)}
+
+    # 跳过已提交批次对应的源数据行
+    rows = islice(READERS[fmt](path), checkpoint['consumed'], None)
+    consumed_in_batch = 0
+
+    def counted(iterable):
+        nonlocal consumed_in_batch
+        for row in iterable:
+            consumed_in_batch += 1
+            yield row
+
+    for batch in _batches(normalized(counted(rows), stats), batch_size):
+        try:
+            # 重复导入同一文件或与已有数据重叠时，id 已存在的行计入跳过
+            batch, duplicates = _drop_existing_ids(batch)
+            stats['skipped'] += duplicates
+            _ensure_categories((row['movie_type'] for row in batch), known_categories)
+            max_id = db.session.query(db.func.max(Movie.id)).scalar() or 0
+            # 搜索索引、补全和相似电影按 updated_at 水位线增量刷新，源数据中较早的
+            # updated_at 会落在水位线之前而永远不被索引，因此写入前统一盖上当前时间
+            now = datetime.utcnow()
+            for row in batch:
+                row['updated_at'] = now
+            # 查询之后才写入的同 id 行（如并发导入）同样跳过，不会中断整个导入
+            insert_ignore(Movie, batch, ['id'])
+            # 新电影是自增 id 大于 max_id 的行，加上源数据自带 id 的行
+            explicit_ids = [row['id'] for row in batch if row['id'] is not None]
+            new_movies = Movie.id > max_id
+            if explicit_ids:
+                new_movies = db.or_(new_movies, Movie.id.in_(explicit_ids))
+            link_categories(new_movies)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            _save_checkpoint(checkpoint_path, checkpoint)
+            raise
+        # 批量 insert 不触发模型事件，手动使分类和榜单缓存失效
+        cache.invalidate('categories', 'rankings', 'movie_ids')
+        checkpoint['consumed'] += consumed_in_batch
+        checkpoint['inserted'] += len(batch)
+        checkpoint['skipped'] += stats['skipped']
+        consumed_in_batch, stats['skipped'] = 0, 0
+        _save_checkpoint(checkpoint_path, checkpoint)
+        logger.info('导入进度', extra={'consumed': checkpoint['consumed'], 'inserted': checkpoint['inserted']})
+
+    # 最后一批之后剩余的无效行
+    checkpoint['consumed'] += consumed_in_batch
+    checkpoint['skipped'] += stats['skipped']
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def init_app(app):
+    @app.cli.command('link-movie-categories')
+    def link_movie_categories_command():
+        """根据 movie_type 补全 movie_category 关联"""
+        count = link_categories()
+        db.session.commit()
+        click.echo(f'新增 {count} 条电影分类关联')
+
+    @app.cli.command('import-movies')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(sorted(READERS)), help='文件格式，默认按扩展名判断')
+    @click.option('--batch-size', default=5000, show_default=True, help='每批写入的行数')
+    @click.option('--checkpoint', 'checkpoint_path', help='断点文件，失败后重新执行会从断点继续')
+    def import_movies_command(path, fmt, batch_size, checkpoint_path):
+        """从 CSV / JSONL / SQL 转储文件批量导入电影"""
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in READERS:
+            raise click.BadParameter(f'无法识别的文件格式: {fmt}')
+        result = import_movies(path, fmt, batch_size, checkpoint_path)
+        click.echo(f"导入完成: 新增 {result['inserted']} 部电影，跳过 {result['skipped']} 行无效或已存在的数据")
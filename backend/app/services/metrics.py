@@ -0,0 +1,140 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from app.extensions import db
+from app.services.pool_metrics import pool_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+# 指标名 -> (说明, 分桶)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('请求耗时', DURATION_BUCKETS),
+    'db_queries_per_request': ('每个请求执行的 SQL 条数', QUERY_COUNT_BUCKETS),
+    'db_query_seconds_per_request': ('每个请求的 SQL 总耗时', DURATION_BUCKETS),
+}
+
+# 连接池统计中累计值类型的字段，其余为当前值
+POOL_COUNTERS = {'wait_count', 'wait_seconds_total', 'timeouts'}
+
+
+class RequestMetrics:
+    """按蓝图端点统计请求耗时和 SQL 条数/耗时，并检测 N+1 查询"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)  # 指标名 -> {endpoint: Histogram}
+        self._n_plus_one = Counter()           # endpoint -> 触发次数
+        self._threshold = 10
+
+    def init_app(self, app):
+        self._threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_time += elapsed
+            g.sql_statements[statement] += 1
+
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+        g.sql_time = 0.0
+        g.sql_statements = Counter()
+
+    def _finish_request(self, response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or 'unknown'
+        statements = g.sql_statements
+        sql_count = sum(statements.values())
+
+        repeated = [(stmt, n) for stmt, n in statements.items() if n > self._threshold]
+        with self._lock:
+            self._observe('http_request_duration_seconds', endpoint, elapsed)
+            self._observe('db_queries_per_request', endpoint, sql_count)
+            self._observe('db_query_seconds_per_request', endpoint, g.sql_time)
+            if repeated:
+                self._n_plus_one[endpoint] += 1
+        for statement, n in repeated:
+            logger.warning('疑似 N+1 查询', extra={
+                'endpoint': endpoint, 'repeat': n, 'statement': ' '.join(statement.split())[:300]
+            })
+        return response
+
+    def _observe(self, name, endpoint, value):
+        histogram = self._histograms[name].get(endpoint)
+        if histogram is None:
+            histogram = self._histograms[name][endpoint] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, histogram in sorted(self._histograms[name].items()):
+                    lines.extend(histogram.render(name, f'endpoint="{endpoint}"'))
+            lines.append('# HELP n_plus_one_requests_total 出现重复 SQL 超过阈值的请求数')
+            lines.append('# TYPE n_plus_one_requests_total counter')
+            for endpoint, count in sorted(self._n_plus_one.items()):
+                lines.append(f'n_plus_one_requests_total{{endpoint="{endpoint}"}} {count}')
+
+        for key, value in pool_stats(db.engine).items():
+            if key != 'pool_class':
+                kind = 'counter' if key in POOL_COUNTERS else 'gauge'
+                lines.append(f'# TYPE db_pool_{key} {kind}')
+                lines.append(f'db_pool_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import bcrypt
+except ImportError:  # 未安装时只能使用 scrypt / pbkdf2
+    bcrypt = None
+
+logger = logging.getLogger(__name__)
+
+# 各算法的默认强度: bcrypt 为 log2 轮数，scrypt 为 N，pbkdf2 为迭代次数
+DEFAULT_COSTS = {
+    'bcrypt': 12,
+    'scrypt': 32768,
+    'pbkdf2': 600000,
+}
+
+
+class PasswordHasherBusy(Exception):
+    """排队的哈希任务已满或等待超时"""
+
+
+def _bcrypt_input(password):
+    # bcrypt 只使用前 72 字节，先做 SHA-256 使长密码的每个字符都参与计算
+    return base64.b64encode(hashlib.sha256(password.encode('utf-8')).digest())
+
+
+def _werkzeug_method(method, cost):
+    if method == 'scrypt':
+        return f'scrypt:{cost}:8:1'
+    return f'pbkdf2:sha256:{cost}'
+
+
+class PasswordHasher:
+    """在有界线程池中计算密码哈希
+
+    bcrypt、hashlib.scrypt 和 pbkdf2_hmac 计算时都会释放 GIL，线程池可以并行。
+    同时进行和排队的任务总数不超过 workers + queue，超出时立即抛出
+    PasswordHasherBusy，登录高峰时不会让所有请求线程都卡在慢速哈希上。
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._method = 'bcrypt'
+        self._cost = DEFAULT_COSTS['bcrypt']
+        self._timeout = 10
+
+    def init_app(self, app):
+        method = app.config.get('PASSWORD_HASH_METHOD', 'bcrypt')
+        if method not in DEFAULT_COSTS:
+            raise ValueError(f'PASSWORD_HASH_METHOD 只能是 {", ".join(DEFAULT_COSTS)}: {method}')
+        if method == 'bcrypt' and bcrypt is None:
+            logger.warning('未安装 bcrypt，密码哈希改用 scrypt')
+            method = 'scrypt'
+        self._method = method
+        self._cost = app.config.get('PASSWORD_HASH_COST') or DEFAULT_COSTS[method]
+        self._timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self._timeout)
+
+        if self._executor is None:
+            workers = app.config.get('PASSWORD_HASH_WORKERS') or min(4, os.cpu_count() or 1)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            self._slots = threading.BoundedSemaphore(workers + app.config.get('PASSWORD_HASH_QUEUE', 32))
+
+        app.register_error_handler(PasswordHasherBusy, self._busy_response)
+
+    def _busy_response(self, e):
+        response = jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('请求过多，请稍后重试')
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self._timeout)
+        except TimeoutError:
+            # 任务仍在队列中时取消，已开始的任务完成后释放名额
+            future.cancel()
+            raise PasswordHasherBusy('请求过多，请稍后重试')
+
+    # ---- 以下函数在线程池中执行 ----
+
+    def _hash(self, password):
+        if self._method == 'bcrypt':
+            return bcrypt.hashpw(_bcrypt_input(password), bcrypt.gensalt(self._cost)).decode('ascii')
+        return generate_password_hash(password, method=_werkzeug_method(self._method, self._cost))
+
+    @staticmethod
+    def _verify(password_hash, password):
+        if password_hash.startswith('$2'):
+            if bcrypt is None:
+                raise RuntimeError('验证 bcrypt 哈希需要安装 bcrypt')
+            return bcrypt.checkpw(_bcrypt_input(password), password_hash.encode('ascii'))
+        return check_password_hash(password_hash, password)
+
+    # ---- 接口 ----
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def hash_in_background(self, password, callback):
+        """不等待结果的哈希，完成后在线程池中调用 callback(哈希)，繁忙时放弃并返回 False"""
+        if not self._slots.acquire(blocking=False):
+            return False
+
+        def task():
+            try:
+                callback(self._hash(password))
+            except Exception:
+                logger.exception('后台计算密码哈希错误')
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def verify(self, password_hash, password):
+        if not password_hash or not password:
+            return False
+        return self._run(self._verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希的算法或强度与当前配置不同"""
+        if password_hash.startswith('$2'):
+            return self._method != 'bcrypt' or password_hash[4:6] != f'{self._cost:02d}'
+        if self._method == 'bcrypt':
+            return True
+        return password_hash.split('$', 1)[0] != _werkzeug_method(self._method, self._cost)
+
+
+password_hasher = PasswordHasher()
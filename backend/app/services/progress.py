@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from app.extensions import cache, db
+from app.models.history import WatchHistory
+from app.models.movie import Movie
+from app.services.write_buffer import WriteBuffer
+from app.utils.upsert import upsert
+
+# 已确认存在的电影 id 集合的上限，超过后清空重新积累
+MAX_KNOWN_MOVIES = 100000
+
+
+class ProgressBuffer(WriteBuffer):
+    """观看进度写入缓冲
+
+    播放器每隔几秒上报一次进度，同一 (user_id, movie_id) 只保留最新的一次，
+    到达时间间隔或条数阈值后批量 upsert 到 watch_history。
+    """
+
+    label = '观看进度'
+    thread_name = 'progress-flush'
+
+    def __init__(self):
+        super().__init__()
+        self._known_movies = set()
+        self._known_version = None
+
+    def init_app(self, app):
+        # 电影有增删改时清空已确认的 id，删除的电影不会一直被当作存在
+        cache.watch(Movie, lambda movie: ['movie_ids'])
+        self.configure(app, app.config.get('PROGRESS_FLUSH_INTERVAL', 5), app.config.get('PROGRESS_FLUSH_SIZE', 500))
+
+    def movie_exists(self, movie_id):
+        """检查电影是否存在，已确认过的 id 不再查库"""
+        version = cache.version('movie_ids')
+        if version != self._known_version:
+            self._known_movies = set()
+            self._known_version = version
+        if movie_id in self._known_movies:
+            return True
+        if db.session.query(Movie.id).filter_by(id=movie_id).first() is None:
+            return False
+        if len(self._known_movies) >= MAX_KNOWN_MOVIES:
+            self._known_movies.clear()
+        self._known_movies.add(movie_id)
+        return True
+
+    def add(self, user_id, movie_id, progress, watch_time=None):
+        watch_time = watch_time or datetime.utcnow()
+        self.put((user_id, movie_id), (progress, watch_time))
+        return watch_time
+
+    def has_pending(self, user_id):
+        with self._lock:
+            return any(key[0] == user_id for key in self._pending)
+
+    def clear(self, user_id, movie_id=None):
+        """删除观看历史（movie_id 为空时删除该用户全部），包括尚未写入的进度，返回删除的行数"""
+        def delete():
+            query = WatchHistory.query.filter_by(user_id=user_id)
+            if movie_id is not None:
+                query = query.filter_by(movie_id=movie_id)
+            count = query.delete(synchronize_session=False)
+            db.session.commit()
+            return count
+
+        _, count = self.discard(lambda key: key[0] == user_id and (movie_id is None or key[1] == movie_id), delete)
+        return count
+
+    def _row(self, key, value):
+        (user_id, movie_id), (progress, watch_time) = key, value
+        return {'user_id': user_id, 'movie_id': movie_id, 'progress': progress, 'watch_time': watch_time}
+
+    def _write(self, rows):
+        upsert(WatchHistory, rows, ['user_id', 'movie_id'], ['progress', 'watch_time'])
+        db.session.commit()
+
+
+progress_buffer = ProgressBuffer()
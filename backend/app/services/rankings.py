@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy.orm import contains_eager
+
+from app.extensions import db
+from app.models.history import WatchHistory
+from app.models.movie_ranking import MovieRanking
+from app.services.background import background_tasks
+
+logger = logging.getLogger(__name__)
+
+# 榜单周期及其滑动窗口，None 表示全部时间
+PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(days=7),
+    'all': None,
+}
+
+# 每个周期保留的榜单长度
+TOP_N = 50
+# 内存快照的有效期（秒），其他进程刷新榜单后最迟在此时间后可见
+SNAPSHOT_TTL = 60
+
+
+class RankingEngine:
+    """从观看记录聚合浏览量，增量维护 MovieRanking 并在内存中保存榜单快照"""
+
+    def __init__(self):
+        self._snapshots = {}  # period -> (加载时间, [ranking dict, ...])
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        @app.cli.command('rankings-refresh')
+        def rankings_refresh_command():
+            """重新计算所有周期的电影排行榜"""
+            self.refresh_all()
+            click.echo('排行榜已更新')
+
+        # 默认只通过 flask rankings-refresh（cron）计算；开启后台刷新时每个 web 进程都会计算，
+        # 并发写入由 (period, movie_id) 唯一约束兜底，失败的一方回滚后下次再试
+        interval = app.config.get('RANKINGS_REFRESH_INTERVAL', 0)
+        if interval:
+            background_tasks.register(lambda: self._start(app, interval))
+
+    def _start(self, app, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name='rankings-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    self.refresh_all()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('更新排行榜错误')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def refresh_all(self, now=None):
+        now = now or datetime.utcnow()
+        for period in PERIODS:
+            self.refresh(period, now)
+
+    def refresh(self, period, now=None):
+        """重新统计一个周期的浏览量，只改动名次或浏览量变化的行"""
+        now = now or datetime.utcnow()
+        window = PERIODS[period]
+        views = db.func.count(WatchHistory.id).label('views')
+        query = db.session.query(WatchHistory.movie_id, views)
+        if window is not None:
+            query = query.filter(WatchHistory.watch_time >= now - window)
+        top = query.group_by(WatchHistory.movie_id) \
+            .order_by(views.desc(), WatchHistory.movie_id.asc()) \
+            .limit(TOP_N).all()
+
+        with self._lock:
+            existing = {row.movie_id: row for row in MovieRanking.query.filter_by(period=period)}
+            for rank, (movie_id, count) in enumerate(top, 1):
+                row = existing.pop(movie_id, None)
+                if row is None:
+                    db.session.add(MovieRanking(movie_id=movie_id, rank=rank, views=count,
+                                                period=period, last_updated=now))
+                elif row.rank != rank or row.views != count:
+                    row.rank, row.views, row.last_updated = rank, count, now
+            for row in existing.values():
+                db.session.delete(row)
+            db.session.commit()
+            self._snapshots[period] = (time.monotonic(), self._load(period))
+
+    def _load(self, period, limit=TOP_N):
+        # 榜单和电影信息一次联表查询取回
+        rows = MovieRanking.query.join(MovieRanking.movie) \
+            .options(contains_eager(MovieRanking.movie)) \
+            .filter(MovieRanking.period == period) \
+            .order_by(MovieRanking.rank.asc()) \
+            .limit(limit).all()
+        return [row.to_dict() for row in rows]
+
+    def top(self, period='all', limit=8):
+        """返回榜单前 limit 名，优先使用内存快照"""
+        loaded_at, snapshot = self._snapshots.get(period, (None, None))
+        if snapshot is None or time.monotonic() - loaded_at > SNAPSHOT_TTL:
+            snapshot = self._load(period)
+            self._snapshots[period] = (time.monotonic(), snapshot)
+        return snapshot[:limit]
+
+
+rankings = RankingEngine()
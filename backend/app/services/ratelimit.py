@@ -0,0 +1,226 @@
+"""登录、注册等接口的限流
+
+使用滑动窗口计数: 把时间按窗口长度切分，当前请求数估计为
+    上一窗口计数 × 上一窗口仍在滑动窗口内的比例 + 当前窗口计数
+每个键只保存两个计数器，比记录每次请求的时间戳省内存，边界处也不会像固定窗口
+那样允许两倍的突发。
+
+策略在 RATELIMIT_POLICIES 中按名称配置，每条规则为 (维度, 次数, 窗口秒数)，
+维度 ip 按客户端地址计数，username 按请求体中的用户名计数。多 worker 部署时
+RATELIMIT_BACKEND 设为 redis，所有进程共享计数。
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ('ip', 'username')
+
+
+class RateLimited(Exception):
+    """超出限流，retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'请求过于频繁，请 {retry_after} 秒后重试')
+        self.retry_after = retry_after
+
+
+def _estimate(previous, current, fraction):
+    return previous * (1 - fraction) + current
+
+
+def _retry_after(previous, current, limit, window, now):
+    """再来一次请求不超过 limit 还需等待的秒数，current 不含被拒绝的请求"""
+    elapsed = now % window
+    if current < limit:
+        # 只需等上一窗口的权重衰减（此时 previous 必然大于 0）
+        fraction = 1 - (limit - current - 1) / previous
+        wait = fraction * window - elapsed
+    else:
+        # 当前窗口已满，等它成为上一窗口并衰减
+        fraction = 1 - (limit - 1) / current
+        wait = window - elapsed + fraction * window
+    return max(1, math.ceil(wait))
+
+
+class MemoryCounters:
+    """进程内计数，多 worker 部署时每个进程单独计数"""
+
+    def __init__(self, max_keys=100000):
+        self._lock = threading.Lock()
+        # key -> [窗口序号, 当前窗口计数, 上一窗口计数]，最近计数的在末尾
+        self._windows = OrderedDict()
+        self._max_keys = max_keys
+
+    def _entry(self, key, index):
+        entry = self._windows.get(key)
+        if entry is None:
+            entry = self._windows[key] = [index, 0, 0]
+        elif entry[0] != index:
+            entry[2] = entry[1] if entry[0] == index - 1 else 0
+            entry[1] = 0
+            entry[0] = index
+        return entry
+
+    def hit(self, rules, now):
+        """rules 为 [(键, 次数, 窗口秒数), ...]，全部未超出时各计入一次请求并返回 None，
+        否则都不计入，返回 (超出的规则序号, 上一窗口计数, 当前窗口计数)"""
+        with self._lock:
+            entries = []
+            for position, (key, limit, window) in enumerate(rules):
+                entry = self._entry(key, int(now // window))
+                previous, current = entry[2], entry[1]
+                if _estimate(previous, current + 1, (now % window) / window) > limit:
+                    return position, previous, current
+                entries.append((key, entry))
+            for key, entry in entries:
+                entry[1] += 1
+                self._windows.move_to_end(key)
+            if len(self._windows) > self._max_keys:
+                self._prune()
+        return None
+
+    def _prune(self):
+        # 计数时键移到末尾，开头是最久没有请求的键。一次删到上限的 90%，之后再新增
+        # 10% 的键才会再次清理，每次计数的均摊开销为常数
+        target = self._max_keys * 9 // 10
+        while len(self._windows) > target:
+            self._windows.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class RedisCounters:
+    """Redis 共享计数，每个窗口一个自增键，两个窗口后过期"""
+
+    def __init__(self, url, prefix='movie:ratelimit:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def hit(self, rules, now):
+        """与 MemoryCounters.hit 相同，先全部计入，有规则超出时再全部撤回"""
+        current_keys = []
+        pipe = self._client.pipeline()
+        for key, limit, window in rules:
+            index = int(now // window)
+            current_key = f'{self._prefix}{key}:{index}'
+            current_keys.append(current_key)
+            pipe.incr(current_key)
+            pipe.expire(current_key, window * 2)
+            pipe.get(f'{self._prefix}{key}:{index - 1}')
+        results = pipe.execute()
+
+        for position, (key, limit, window) in enumerate(rules):
+            current, _, previous = results[position * 3:position * 3 + 3]
+            previous = int(previous or 0)
+            if _estimate(previous, current, (now % window) / window) > limit:
+                # 被拒绝的请求在所有规则中都不计入
+                pipe = self._client.pipeline()
+                for current_key in current_keys:
+                    pipe.decr(current_key)
+                pipe.execute()
+                return position, previous, current - 1
+        return None
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class RateLimiter:
+    def __init__(self):
+        self.counters = None
+        self._enabled = True
+        self._policies = {}
+        self._trusted_proxies = 0
+
+    def init_app(self, app):
+        self._enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self._trusted_proxies = app.config.get('RATELIMIT_TRUSTED_PROXIES', 0)
+        self._policies = {}
+        for name, rules in app.config.get('RATELIMIT_POLICIES', {}).items():
+            for scope, limit, window in rules:
+                if scope not in SCOPES:
+                    raise ValueError(f'限流维度只能是 {", ".join(SCOPES)}: {scope}')
+            self._policies[name] = [(scope, int(limit), int(window)) for scope, limit, window in rules]
+
+        backend = app.config.get('RATELIMIT_BACKEND') or app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            self.counters = RedisCounters(app.config.get('RATELIMIT_REDIS_URL') or app.config['CACHE_REDIS_URL'])
+        else:
+            self.counters = MemoryCounters(app.config.get('RATELIMIT_MAX_KEYS', 100000))
+
+        app.register_error_handler(RateLimited, self._limited_response)
+
+    def _limited_response(self, e):
+        response = jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+    def _client_ip(self):
+        # 经过反向代理时，X-Forwarded-For 从右数第 N 个才是可信的客户端地址
+        if self._trusted_proxies:
+            route = request.access_route
+            if len(route) >= self._trusted_proxies:
+                return route[-self._trusted_proxies]
+        return request.remote_addr or 'unknown'
+
+    def _identity(self, scope):
+        if scope == 'ip':
+            return self._client_ip()
+        data = request.get_json(silent=True)
+        username = data.get('username') if isinstance(data, dict) else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.strip().lower()[:80]
+
+    def check(self, name):
+        """按策略 name 计入当前请求，超出时抛出 RateLimited
+
+        先检查所有规则再计数，被某条规则拒绝的请求不占用其他规则的额度，
+        例如同一用户名被限流时不会继续消耗该 ip 的次数。
+        """
+        if not self._enabled:
+            return
+        now = time.time()
+        rules, scopes = [], []
+        for scope, limit, window in self._policies.get(name, ()):
+            identity = self._identity(scope)
+            if identity is None:
+                continue
+            rules.append((f'{name}:{scope}:{identity}:{window}', limit, window))
+            scopes.append(scope)
+        if not rules:
+            return
+        rejected = self.counters.hit(rules, now)
+        if rejected is not None:
+            position, previous, current = rejected
+            _, limit, window = rules[position]
+            logger.warning('请求被限流', extra={'policy': name, 'scope': scopes[position]})
+            raise RateLimited(_retry_after(previous, current, limit, window, now))
+
+    def limit(self, name):
+        """视图装饰器，在视图函数执行前按策略 name 限流"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                self.check(name)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+rate_limiter = RateLimiter()
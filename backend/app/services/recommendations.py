@@ -0,0 +1,232 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+import numpy as np
+from scipy import sparse
+
+from app.extensions import db
+from app.models.history import WatchHistory
+from app.models.movie import Movie
+from app.models.recommendation import UserRecommendation
+from app.services.background import background_tasks
+from app.services.rankings import rankings
+from app.utils.serializer import movie_list_serializer
+from app.utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+# 每个用户保存的推荐数
+TOP_N = 50
+# 每部电影保留的相似电影数，其余相似度置零以控制矩阵密度
+NEIGHBORS = 50
+# 每个分片包含的用户数
+SHARD_SIZE = 2000
+# 只看了开头就退出的记录也算弱正反馈
+MIN_WEIGHT = 0.1
+
+
+# ---- 计算，以下函数不访问数据库，可以在子进程中执行 ----
+
+def interaction_matrix(user_ids, movie_ids, progress):
+    """用户 x 电影的稀疏矩阵，值为按观看进度换算的偏好权重 (MIN_WEIGHT~1)"""
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    items, item_index = np.unique(movie_ids, return_inverse=True)
+    weights = np.clip(np.nan_to_num(progress) / 100.0, MIN_WEIGHT, 1.0)
+    matrix = sparse.csr_matrix(
+        (weights.astype(np.float32), (user_index, item_index)), shape=(len(users), len(items))
+    )
+    matrix.sum_duplicates()
+    return users, items, matrix
+
+
+def _keep_top_per_row(matrix, k):
+    """每行只保留最大的 k 个值"""
+    indptr, indices, data = [0], [], []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        row_indices, row_data = matrix.indices[start:end], matrix.data[start:end]
+        if end - start > k:
+            top = np.argpartition(-row_data, k - 1)[:k]
+            row_indices, row_data = row_indices[top], row_data[top]
+        indices.append(row_indices)
+        data.append(row_data)
+        indptr.append(indptr[-1] + len(row_data))
+    return sparse.csr_matrix(
+        (np.concatenate(data) if data else [], np.concatenate(indices) if indices else [], indptr),
+        shape=matrix.shape
+    )
+
+
+def item_similarity(matrix, neighbors=NEIGHBORS):
+    """电影之间的余弦相似度: 列归一化后的共现矩阵 X^T X，去掉对角线并按行截断"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = matrix @ sparse.diags(scale.astype(np.float32))
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return _keep_top_per_row(similarity, neighbors)
+
+
+_similarity = None
+_items = None
+
+
+def _init_worker(similarity, items):
+    global _similarity, _items
+    _similarity, _items = similarity, items
+
+
+def score_shard(shard):
+    """为一个分片的用户打分，返回 [(user_id, [movie_id, ...]), ...]，已看过的电影不推荐"""
+    user_ids, history, top_n = shard
+    scores = (history @ _similarity).tocsr()
+    results = []
+    for row, user_id in enumerate(user_ids):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        items, values = scores.indices[start:end], scores.data[start:end]
+        watched = history.indices[history.indptr[row]:history.indptr[row + 1]]
+        unseen = ~np.isin(items, watched)
+        items, values = items[unseen], values[unseen]
+        if len(values) > top_n:
+            top = np.argpartition(-values, top_n - 1)[:top_n]
+            items, values = items[top], values[top]
+        order = np.argsort(-values, kind='stable')
+        results.append((int(user_id), _items[items[order]].tolist()))
+    return results
+
+
+# ---- 任务 ----
+
+class RecommendationEngine:
+    """基于物品共现的协同过滤
+
+    后台任务从 watch_history 构建稀疏矩阵，按用户分片交给进程池打分，把每个用户的
+    前 TOP_N 部电影写入 user_recommendations。请求时只按主键读取一行，没有推荐的
+    用户返回热门榜单。
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._workers = None
+
+    def init_app(self, app):
+        self._workers = app.config.get('RECOMMENDATIONS_WORKERS') or os.cpu_count() or 1
+
+        @app.cli.command('recommendations-refresh')
+        @click.option('--workers', type=int, help='进程数，默认使用配置 RECOMMENDATIONS_WORKERS')
+        def recommendations_refresh_command(workers):
+            """重新计算所有用户的个性化推荐"""
+            count = self.refresh(workers)
+            click.echo(f'已更新 {count} 个用户的推荐')
+
+        interval = app.config.get('RECOMMENDATIONS_REFRESH_INTERVAL', 0)
+        if interval:
+            background_tasks.register(lambda: self._start(app, interval))
+
+    def _start(self, app, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name='recommendations-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('计算个性化推荐错误')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def _load_history(self):
+        rows = db.session.query(WatchHistory.user_id, WatchHistory.movie_id, WatchHistory.progress) \
+            .join(Movie, Movie.id == WatchHistory.movie_id) \
+            .yield_per(10000)
+        user_ids, movie_ids, progress = [], [], []
+        for user_id, movie_id, value in rows:
+            user_ids.append(user_id)
+            movie_ids.append(movie_id)
+            progress.append(value if value is not None else 0.0)
+        return (np.array(user_ids, dtype=np.int64), np.array(movie_ids, dtype=np.int64),
+                np.array(progress, dtype=np.float64))
+
+    def refresh(self, workers=None):
+        """全量重新计算推荐，返回写入的用户数"""
+        started = time.perf_counter()
+        # generated_at 列为不带小数秒的 DATETIME，MySQL 写入时会四舍五入到秒。舍入后可能早于
+        # 带微秒的比较值，下面的删除会误删本轮刚写入的推荐，因此先截断到秒
+        generated_at = datetime.utcnow().replace(microsecond=0)
+        users, items, matrix = interaction_matrix(*self._load_history())
+        similarity = item_similarity(matrix) if matrix.nnz else None
+        shards = [] if similarity is None else [
+            (users[start:start + SHARD_SIZE], matrix[start:start + SHARD_SIZE], TOP_N)
+            for start in range(0, len(users), SHARD_SIZE)
+        ]
+
+        workers = min(workers or self._workers or 1, len(shards))
+        if workers > 1:
+            # spawn 启动的子进程不继承 web 进程的线程和数据库连接。子进程会重新导入
+            # 主模块，run.py 在子进程中不创建应用，打分函数也不需要应用上下文
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(similarity, items)
+            )
+            results = pool.map(score_shard, shards)
+        else:
+            pool = None
+            _init_worker(similarity, items)
+            results = map(score_shard, shards)
+
+        count = 0
+        try:
+            for shard_result in results:
+                rows = [
+                    {'user_id': user_id, 'movie_ids': movie_ids, 'generated_at': generated_at}
+                    for user_id, movie_ids in shard_result if movie_ids
+                ]
+                upsert(UserRecommendation, rows, ['user_id'], ['movie_ids', 'generated_at'])
+                db.session.commit()
+                count += len(rows)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # 本轮没有结果的用户（如已清空历史）删除旧推荐
+        UserRecommendation.query.filter(UserRecommendation.generated_at < generated_at).delete()
+        db.session.commit()
+        logger.info('个性化推荐已更新', extra={
+            'users': count, 'movies': len(items), 'shards': len(shards),
+            'seconds': round(time.perf_counter() - started, 2)
+        })
+        return count
+
+    def for_user(self, user_id, limit=20):
+        """返回 (来源, 电影字典列表)，来源为 personalized 或 popular"""
+        row = db.session.get(UserRecommendation, user_id)
+        if row is not None and row.movie_ids:
+            movie_ids = row.movie_ids[:limit]
+            movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(movie_ids))}
+            return 'personalized', movie_list_serializer.many(
+                movies[movie_id] for movie_id in movie_ids if movie_id in movies
+            )
+
+        # 冷启动: 使用近一周的热门榜单，没有数据时使用总榜
+        ranked = rankings.top('weekly', limit) or rankings.top('all', limit)
+        return 'popular', [
+            {name: item['movie'][name] for name in movie_list_serializer.names}
+            for item in ranked if item['movie']
+        ]
+
+
+recommendations = RecommendationEngine()
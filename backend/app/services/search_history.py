@@ -0,0 +1,198 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import func, select
+
+from app.extensions import cache, db
+from app.models.search_history import SearchHistory
+from app.services.cache import LocalCache
+from app.services.write_buffer import WriteBuffer
+from app.utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+
+def _namespace(user_id):
+    return f'search_history:{user_id}'
+
+
+class SearchHistoryStore(WriteBuffer):
+    """用户搜索历史
+
+    每个用户只保留最近 SEARCH_HISTORY_SIZE 个不同的搜索词，以 OrderedDict
+    （搜索词 -> (时间, id)，最新的在末尾）缓存在进程内（见 LocalCache），读取时不查表。
+    新的搜索先进入写入缓冲区，到达时间间隔或条数阈值后批量 upsert 到 search_history，
+    写入后递增 search_history:<user_id> 命名空间的版本号使缓存失效，缓存另外在
+    SEARCH_HISTORY_CACHE_TTL 秒后过期。
+    后台定期压缩表，删除超过保留天数的记录和每个用户超出容量的旧记录。
+    """
+
+    label = '搜索历史'
+    thread_name = 'search-history-flush'
+
+    def __init__(self):
+        # 写入缓冲区的键为 (user_id, 搜索词)，值为搜索时间
+        super().__init__()
+        # user_id -> OrderedDict，与写入缓冲区共用一把锁
+        self._rings = LocalCache(cache, _namespace, lock=self._lock)
+        self._size = 8
+        self._window = timedelta(days=7)
+        self._retention = timedelta(days=30)
+        self._compact_interval = 3600
+        self._compacted_at = 0.0
+
+    def init_app(self, app):
+        self._size = app.config.get('SEARCH_HISTORY_SIZE', self._size)
+        self._window = timedelta(days=app.config.get('SEARCH_HISTORY_WINDOW_DAYS', 7))
+        # 补全词的热度来自搜索历史，保留期不短于展示窗口
+        self._retention = max(self._window, timedelta(days=app.config.get('SEARCH_HISTORY_RETENTION_DAYS', 30)))
+        self._rings.max_entries = app.config.get('SEARCH_HISTORY_CACHE_USERS', self._rings.max_entries)
+        self._rings.ttl = app.config.get('SEARCH_HISTORY_CACHE_TTL', self._rings.ttl)
+        self._compact_interval = app.config.get('SEARCH_HISTORY_COMPACT_INTERVAL', 3600)
+        self._compacted_at = time.monotonic()
+        self.configure(
+            app, app.config.get('SEARCH_HISTORY_FLUSH_INTERVAL', 5), app.config.get('SEARCH_HISTORY_FLUSH_SIZE', 500)
+        )
+
+        @app.cli.command('search-history-compact')
+        def search_history_compact_command():
+            """删除过期和超出每个用户容量的搜索历史"""
+            click.echo(f'已删除 {self.compact()} 条搜索历史')
+
+    # ---- 读取 ----
+
+    def _load(self, user_id):
+        rows = db.session.query(SearchHistory.search_query, SearchHistory.created_at, SearchHistory.id).filter(
+            SearchHistory.user_id == user_id,
+            SearchHistory.created_at >= datetime.utcnow() - self._window
+        ).order_by(SearchHistory.created_at.desc()).limit(self._size)
+        return OrderedDict((query, (created_at, history_id)) for query, created_at, history_id in reversed(rows.all()))
+
+    def _ring(self, user_id):
+        def merge(ring):
+            # 合并尚未写入数据库的搜索
+            pending = [(query, created_at) for (owner, query), created_at in self._pending.items() if owner == user_id]
+            for query, created_at in sorted(pending, key=lambda item: item[1]):
+                self._push(ring, query, created_at)
+
+        return self._rings.get(user_id, lambda: self._load(user_id), merge)
+
+    def _push(self, ring, query, created_at):
+        # 已有的搜索词移到最新位置，数据库中的 id 不变
+        _, history_id = ring.pop(query, (None, None))
+        ring[query] = (created_at, history_id)
+        while len(ring) > self._size:
+            ring.popitem(last=False)
+
+    def recent(self, user_id):
+        """展示窗口内最近的搜索，最新的在前"""
+        ring = self._ring(user_id)
+        cutoff = datetime.utcnow() - self._window
+        with self._lock:
+            items = list(ring.items())
+        return [
+            {'id': history_id, 'search_query': query, 'created_at': created_at.isoformat()}
+            for query, (created_at, history_id) in reversed(items) if created_at >= cutoff
+        ]
+
+    # ---- 写入 ----
+
+    def add(self, user_id, search_query, created_at=None):
+        created_at = created_at or datetime.utcnow()
+        with self._lock:
+            ring = self._rings.peek(user_id)
+            if ring is not None:
+                self._push(ring, search_query, created_at)
+        self.put((user_id, search_query), created_at)
+
+    def _delete(self, user_id, search_query=None):
+        """删除用户的搜索（search_query 为空时全部），包括尚未写入和写入失败待重试的，
+        返回是否删除了任何记录
+
+        丢弃缓冲和删除表中的行在写入锁内进行，正在写入的一批提交之后才删除，
+        删除的搜索不会被写回。
+        """
+        def delete():
+            query = SearchHistory.query.filter_by(user_id=user_id)
+            if search_query is not None:
+                query = query.filter_by(search_query=search_query)
+            count = query.delete(synchronize_session=False)
+            db.session.commit()
+            return count
+
+        discarded, count = self.discard(
+            lambda key: key[0] == user_id and (search_query is None or key[1] == search_query), delete
+        )
+        with self._lock:
+            ring = self._rings.peek(user_id)
+            if ring is not None:
+                if search_query is None:
+                    ring.clear()
+                else:
+                    ring.pop(search_query, None)
+        # 批量删除不触发模型事件，手动使缓存失效
+        cache.invalidate(_namespace(user_id))
+        return discarded > 0 or count > 0
+
+    def remove(self, user_id, search_query):
+        """删除一条搜索，不存在时返回 False"""
+        return self._delete(user_id, search_query)
+
+    def clear(self, user_id):
+        self._delete(user_id)
+
+    def _row(self, key, created_at):
+        user_id, search_query = key
+        return {'user_id': user_id, 'search_query': search_query, 'created_at': created_at}
+
+    def _write(self, rows):
+        upsert(SearchHistory, rows, ['user_id', 'search_query'], ['created_at'])
+        db.session.commit()
+
+    def _written(self, keys):
+        # 新插入的行有了 id，重新加载这些用户的缓存
+        cache.invalidate(*{_namespace(user_id) for user_id, _ in keys})
+
+    # ---- 压缩 ----
+
+    def compact(self):
+        """删除超过保留期和每个用户超出容量的记录，返回删除条数"""
+        expired = SearchHistory.query.filter(
+            SearchHistory.created_at < datetime.utcnow() - self._retention
+        ).delete(synchronize_session=False)
+
+        ranked = select(
+            SearchHistory.id,
+            func.row_number().over(
+                partition_by=SearchHistory.user_id,
+                order_by=(SearchHistory.created_at.desc(), SearchHistory.id.desc())
+            ).label('position')
+        ).where(SearchHistory.user_id.isnot(None)).subquery()
+        # 多包一层子查询，MySQL 不允许 DELETE 的子查询直接引用目标表
+        overflow = SearchHistory.query.filter(
+            SearchHistory.id.in_(select(ranked.c.id).where(ranked.c.position > self._size))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        logger.info('搜索历史压缩完成', extra={'expired': expired, 'overflow': overflow})
+        return expired + overflow
+
+    def _compact_in_context(self):
+        with self._app.app_context():
+            try:
+                self.compact()
+            except Exception:
+                db.session.rollback()
+                logger.exception('压缩搜索历史错误')
+            finally:
+                db.session.remove()
+
+    def _tick(self):
+        if self._compact_interval and time.monotonic() - self._compacted_at >= self._compact_interval:
+            self._compacted_at = time.monotonic()
+            self._compact_in_context()
+
+
+search_history_store = SearchHistoryStore()
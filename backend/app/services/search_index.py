@@ -0,0 +1,208 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from app.extensions import db
+from app.models.movie import Movie
+from app.services.background import IndexNotReady, background_tasks
+
+logger = logging.getLogger(__name__)
+
+# 连续的中日韩字符按二元组切分，其余按单词切分
+_CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'
+_TOKEN_RE = re.compile(f'[{_CJK_RANGES}]+|[0-9a-z]+')
+_CJK_RE = re.compile(f'[{_CJK_RANGES}]')
+
+# 各字段在词频中的权重
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'director': 2.0,
+    'movie_type': 2.0,
+    'description': 1.0,
+}
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+# 未启用后台刷新时，查询距离上次增量刷新至少间隔的秒数
+REFRESH_INTERVAL = 30
+# 增量刷新时在水位线之前多扫描的时间窗口。updated_at 由应用写入，事务提交晚于其他
+# 事务，或与水位线同一秒（MySQL DATETIME 精度）更新的行，其 updated_at 可能不大于
+# 已记录的水位线，重新扫描这段窗口不会漏掉它们；重复索引同一部电影结果不变
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def tokenize(text):
+    """分词: 中文按字符二元组，英文和数字按单词，统一小写"""
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class SearchIndex:
+    """基于 Movie 表的内存倒排索引，使用 BM25 打分"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # term -> {movie_id: 加权词频}
+        self._doc_terms = {}                # movie_id -> 该文档包含的词
+        self._doc_len = {}                  # movie_id -> 加权文档长度
+        self._total_len = 0.0
+        self._watermark = None              # 已索引的最大 updated_at
+        self._last_refresh = 0.0
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        interval = app.config.get('SEARCH_INDEX_REFRESH_INTERVAL', REFRESH_INTERVAL)
+        if interval:
+            background_tasks.register(lambda: self._start(app, interval))
+
+    def _start(self, app, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name='search-index-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    self.refresh(force=True)
+                except Exception:
+                    logger.exception('刷新搜索索引错误')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def ensure_fresh(self):
+        """查询前调用: 后台线程运行时只检查索引是否已完成首次构建，否则按 REFRESH_INTERVAL 同步刷新"""
+        if self._thread is None:
+            self.refresh()
+        elif not self._last_refresh:
+            raise IndexNotReady('搜索索引正在构建，请稍后重试', REFRESH_INTERVAL)
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def _remove(self, movie_id):
+        for term in self._doc_terms.pop(movie_id, ()):
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(movie_id, None)
+                if not docs:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(movie_id, 0.0)
+
+    @staticmethod
+    def _analyze(movie):
+        freqs = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(movie, field)):
+                freqs[token] += weight
+        return freqs
+
+    def _add(self, movie_id, freqs):
+        self._remove(movie_id)
+        for term, tf in freqs.items():
+            self._postings[term][movie_id] = tf
+        length = sum(freqs.values())
+        self._doc_terms[movie_id] = tuple(freqs)
+        self._doc_len[movie_id] = length
+        self._total_len += length
+
+    def refresh(self, force=False):
+        """增量刷新: 只重建 updated_at 不早于水位线减去 WATERMARK_OVERLAP 的电影，并清理已删除的电影
+
+        查库和分词在索引锁之外进行，只有写入倒排表时持有锁，刷新期间查询不受阻塞。
+        """
+        now = time.monotonic()
+        if not force and self._last_refresh and now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        # 已有线程在刷新时直接使用当前索引
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            columns = [Movie.id, Movie.updated_at] + [getattr(Movie, f) for f in FIELD_WEIGHTS]
+            query = db.session.query(*columns)
+            if self._watermark is not None:
+                query = query.filter(Movie.updated_at >= self._watermark - WATERMARK_OVERLAP)
+            watermark = self._watermark
+            changed = []
+            for row in query.order_by(Movie.updated_at, Movie.id).yield_per(1000):
+                changed.append((row.id, self._analyze(row)))
+                if row.updated_at is not None:
+                    watermark = row.updated_at
+
+            with self._lock:
+                for movie_id, freqs in changed:
+                    self._add(movie_id, freqs)
+            self._watermark = watermark
+
+            # updated_at 无法反映删除，行数不一致时再比对 id
+            if db.session.query(db.func.count(Movie.id)).scalar() != len(self._doc_len):
+                live_ids = {movie_id for movie_id, in db.session.query(Movie.id)}
+                with self._lock:
+                    for movie_id in set(self._doc_len) - live_ids:
+                        self._remove(movie_id)
+            self._last_refresh = now
+        finally:
+            self._refresh_lock.release()
+
+    def _expand(self, token):
+        # 单个汉字的查询没有对应的二元组，匹配包含该字的所有词
+        if len(token) == 1 and _CJK_RE.match(token):
+            return [term for term in self._postings if token in term]
+        return [token]
+
+    def search(self, query, offset=0, limit=20):
+        """返回 (命中总数, [(movie_id, score), ...])，按得分降序"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return 0, []
+            avg_len = self._total_len / n_docs
+
+            groups = [self._expand(token) for token in terms]
+            matched = [set().union(*(self._postings.get(t, {}) for t in group)) for group in groups]
+            # 优先返回包含全部查询词的电影，没有时退化为任一词命中
+            candidates = set.intersection(*matched) if all(matched) else set()
+            if not candidates:
+                candidates = set().union(*matched)
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for group in groups:
+                for term in group:
+                    docs = self._postings.get(term)
+                    if not docs:
+                        continue
+                    idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for movie_id in candidates if len(candidates) < len(docs) else docs:
+                        tf = docs.get(movie_id)
+                        if tf and movie_id in scores:
+                            norm = K1 * (1 - B + B * self._doc_len[movie_id] / avg_len)
+                            scores[movie_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return len(ranked), ranked[offset:offset + limit]
+
+
+search_index = SearchIndex()
@@ -0,0 +1,401 @@
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import click
+import numpy as np
+
+from app.extensions import db
+from app.models.movie import Movie
+from app.services.background import IndexNotReady, background_tasks
+from app.services.search_index import WATERMARK_OVERLAP, tokenize
+
+logger = logging.getLogger(__name__)
+
+# 特征块: 名称 -> (维数, 权重)。各块单独 L2 归一化后乘以权重，整行再做 L2 归一化，
+# 两部电影的余弦相似度即为两行的内积
+BLOCKS = {
+    'description': (256, 1.0),
+    'movie_type': (32, 0.7),
+    'director': (64, 0.5),
+    'year': (16, 0.3),
+    'rating': (10, 0.2),
+}
+OFFSETS = {}
+_offset = 0
+for _name, (_size, _) in BLOCKS.items():
+    OFFSETS[_name] = (_offset, _offset + _size)
+    _offset += _size
+DIM = _offset
+
+# 特征布局或权重变化时递增，旧版本的索引文件会被忽略
+FEATURE_VERSION = 1
+
+# 上映年份按 5 年分桶，相邻桶记一半权重，评分同理按 1 分分桶
+YEAR_START = 1950
+YEAR_BUCKET = 5
+NEIGHBOR_WEIGHT = 0.5
+
+# 后台增量刷新的默认间隔，以及未启用后台线程时查询触发同步刷新的最短间隔（秒）
+REFRESH_INTERVAL = 30
+# 增量更新的电影超过该数量且超过总数的 5% 时整体重建
+COMPACT_MIN_ROWS = 1000
+BUILD_BATCH_SIZE = 1000
+_COLUMNS = ('id', 'description', 'movie_type', 'director', 'release_date', 'rating', 'updated_at')
+
+
+def _hash(value):
+    return zlib.crc32(value.encode('utf-8'))
+
+
+def _bucket(vector, block, index, weight=1.0):
+    start, end = OFFSETS[block]
+    vector[start + index % (end - start)] += weight
+
+
+def _smeared(vector, block, index):
+    """index 所在桶记 1，相邻桶记 NEIGHBOR_WEIGHT"""
+    start, end = OFFSETS[block]
+    size = end - start
+    index = min(max(index, 0), size - 1)
+    vector[start + index] = 1.0
+    for neighbor in (index - 1, index + 1):
+        if 0 <= neighbor < size:
+            vector[start + neighbor] = NEIGHBOR_WEIGHT
+
+
+def raw_features(row, vector):
+    """把一部电影写成未加权的特征行，描述部分为有符号哈希的词频"""
+    start, end = OFFSETS['description']
+    size = end - start
+    for token in tokenize(row.description):
+        h = _hash(token)
+        vector[start + h % size] += 1.0 if h & 0x80000000 else -1.0
+    if row.movie_type:
+        _bucket(vector, 'movie_type', _hash(row.movie_type.strip()))
+    if row.director:
+        _bucket(vector, 'director', _hash(row.director.strip()))
+    if row.release_date:
+        _smeared(vector, 'year', (row.release_date.year - YEAR_START) // YEAR_BUCKET)
+    if row.rating is not None:
+        _smeared(vector, 'rating', int(row.rating))
+
+
+def finish(matrix, idf):
+    """对原始特征行就地应用 IDF、分块归一化和加权，最后整行 L2 归一化"""
+    for name, (_, weight) in BLOCKS.items():
+        start, end = OFFSETS[name]
+        block = matrix[:, start:end]
+        if name == 'description':
+            block *= idf
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        np.divide(block, norms, out=block, where=norms > 0)
+        block *= weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+
+class _State:
+    """一次构建的结果加上增量更新，替换整个对象以保证查询读到一致的数据"""
+
+    def __init__(self, generation, ids, matrix, idf, watermark, overlay=None, dead=None):
+        self.generation = generation
+        self.ids = ids                  # 按 id 升序，与 matrix 的行对齐
+        self.matrix = matrix            # 内存映射的特征矩阵
+        self.idf = idf
+        self.watermark = watermark      # 已计算的最大 updated_at
+        self.overlay = overlay or {}    # 构建后新增或修改的电影 id -> 特征行
+        self.dead = dead if dead is not None else np.zeros(len(ids), dtype=bool)
+        self.overlay_ids = np.fromiter(self.overlay, dtype=np.int64, count=len(self.overlay))
+        self.overlay_matrix = np.array(list(self.overlay.values()), dtype=np.float32).reshape(-1, DIM)
+
+    def row_of(self, movie_id):
+        i = int(np.searchsorted(self.ids, movie_id))
+        return i if i < len(self.ids) and self.ids[i] == movie_id else None
+
+    def vector(self, movie_id):
+        vector = self.overlay.get(movie_id)
+        if vector is not None:
+            return vector
+        i = self.row_of(movie_id)
+        if i is None or self.dead[i]:
+            return None
+        return np.asarray(self.matrix[i])
+
+    def live_checksum(self):
+        """索引中电影的 (数量, id 之和)，与数据库比对以发现删除"""
+        # 覆盖层中的电影在基础矩阵里已标记为失效，两部分没有重叠
+        live = self.ids[~self.dead]
+        return len(live) + len(self.overlay), int(live.sum()) + sum(self.overlay)
+
+    def top_k(self, query, k, exclude=()):
+        """与 query 内积最大的 k 部电影，返回 [(movie_id, score), ...]"""
+        scores = self.matrix @ query
+        scores[self.dead] = -np.inf
+        ids = self.ids
+        if len(self.overlay_ids):
+            ids = np.concatenate([ids, self.overlay_ids])
+            scores = np.concatenate([scores, self.overlay_matrix @ query])
+        if exclude:
+            scores[np.isin(ids, list(exclude))] = -np.inf
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i]) and scores[i] > 0]
+
+
+class SimilarIndex:
+    """基于内容特征的相似电影索引
+
+    特征矩阵按行 L2 归一化，查询一部电影（或一组电影的平均向量）的相似电影只需一次
+    矩阵-向量乘法。矩阵保存为 .npy 文件并以内存映射方式加载，多个 worker 进程共享
+    页缓存；构建之后修改过的电影按 updated_at 水位线增量计算，放在内存中的
+    覆盖层里，覆盖层过大时整体重建。构建和刷新在后台线程中进行，不占用请求。
+    """
+
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+        self._directory = None
+        self._last_refresh = 0.0
+        self._thread = None
+
+    def init_app(self, app):
+        directory = app.config.get('SIMILAR_INDEX_DIR')
+        # 为空字符串时只在内存中构建，不写文件
+        self._directory = os.path.join(app.instance_path, 'similar') if directory is None else directory
+
+        @app.cli.command('similar-rebuild')
+        def similar_rebuild_command():
+            """重建相似电影特征矩阵"""
+            self.build()
+            click.echo(f'相似电影索引已重建，共 {len(self._state.ids)} 部电影')
+
+        if self._directory:
+            try:
+                self._state = self._load()
+            except (OSError, ValueError):
+                logger.exception('加载相似电影索引错误')
+
+        interval = app.config.get('SIMILAR_INDEX_REFRESH_INTERVAL', REFRESH_INTERVAL)
+        if interval:
+            background_tasks.register(lambda: self._start(app, interval))
+
+    def _start(self, app, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name='similar-index-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    self.refresh(force=True)
+                except Exception:
+                    logger.exception('刷新相似电影索引错误')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def ensure_fresh(self):
+        """查询前调用: 后台线程运行时只检查索引是否可用，否则按 REFRESH_INTERVAL 同步刷新"""
+        if self._thread is None:
+            self.refresh()
+        elif self._state is None:
+            raise IndexNotReady('相似电影索引正在构建，请稍后重试', REFRESH_INTERVAL)
+
+    # ---- 文件 ----
+
+    def _current_generation(self):
+        try:
+            with open(os.path.join(self._directory, 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        generation = self._current_generation()
+        if generation is None:
+            return None
+        path = os.path.join(self._directory, generation)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FEATURE_VERSION:
+            return None
+        count = meta['count']
+        matrix = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')[:count]
+        ids = np.load(os.path.join(path, 'ids.npy'))
+        idf = np.load(os.path.join(path, 'idf.npy'))
+        watermark = meta['watermark']
+        if isinstance(watermark, list):
+            # 曾经记录为 [updated_at, id]
+            watermark = watermark[0]
+        watermark = datetime.fromisoformat(watermark) if watermark else None
+        logger.info('已加载相似电影索引', extra={'generation': generation, 'count': count})
+        return _State(generation, ids, matrix, idf, watermark)
+
+    def _publish(self, generation):
+        tmp = os.path.join(self._directory, 'CURRENT.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(self._directory, 'CURRENT'))
+        # 其他进程可能仍映射着旧文件，删除目录项不影响已建立的映射
+        for name in os.listdir(self._directory):
+            if name.startswith('gen-') and name != generation:
+                shutil.rmtree(os.path.join(self._directory, name), ignore_errors=True)
+
+    # ---- 构建 ----
+
+    def build(self):
+        """从 Movie 表全量构建特征矩阵，写入新的一代文件后切换"""
+        total = db.session.query(db.func.count(Movie.id)).scalar()
+        generation = f'gen-{int(time.time() * 1000)}'
+        path = os.path.join(self._directory, generation) if self._directory else None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            matrix = np.lib.format.open_memmap(
+                os.path.join(path, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(max(total, 1), DIM)
+            )
+        else:
+            matrix = np.zeros((max(total, 1), DIM), dtype=np.float32)
+        ids = np.zeros(total, dtype=np.int64)
+        doc_freq = np.zeros(BLOCKS['description'][0], dtype=np.float64)
+        start, end = OFFSETS['description']
+        watermark = None
+
+        count = 0
+        query = db.session.query(*[getattr(Movie, name) for name in _COLUMNS]).order_by(Movie.id)
+        for row in query.yield_per(BUILD_BATCH_SIZE):
+            if count >= total:
+                break  # 统计行数之后新增的电影留给增量刷新
+            raw_features(row, matrix[count])
+            doc_freq += matrix[count, start:end] != 0
+            ids[count] = row.id
+            if row.updated_at and (watermark is None or row.updated_at > watermark):
+                watermark = row.updated_at
+            count += 1
+
+        idf = (np.log((1 + count) / (1 + doc_freq)) + 1).astype(np.float32)
+        for offset in range(0, count, 10000):
+            finish(matrix[offset:min(offset + 10000, count)], idf)
+        ids = ids[:count]
+
+        if path:
+            matrix.flush()
+            del matrix
+            np.save(os.path.join(path, 'ids.npy'), ids)
+            np.save(os.path.join(path, 'idf.npy'), idf)
+            with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': FEATURE_VERSION,
+                    'count': count,
+                    'watermark': watermark.isoformat() if watermark else None,
+                }, f)
+            self._publish(generation)
+            state = self._load()
+        else:
+            state = _State(generation, ids, matrix[:count], idf, watermark)
+        self._state = state
+        self._last_refresh = time.monotonic()
+        return state
+
+    def _vectors(self, rows, idf):
+        matrix = np.zeros((len(rows), DIM), dtype=np.float32)
+        for i, row in enumerate(rows):
+            raw_features(row, matrix[i])
+        finish(matrix, idf)
+        return matrix
+
+    def refresh(self, force=False):
+        """增量刷新: 计算 updated_at 不早于水位线减去 WATERMARK_OVERLAP 的电影，并标记已删除的电影"""
+        now = time.monotonic()
+        if not force and self._state is not None and now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        # 已有线程在刷新时直接使用旧数据，首次构建时等待
+        if not self._lock.acquire(blocking=self._state is None):
+            return
+        try:
+            state = self._state
+            # 其他进程已经重建并切换了文件
+            if self._directory and (state is None or self._current_generation() != state.generation):
+                try:
+                    state = self._load() or state
+                except (OSError, ValueError):
+                    logger.exception('加载相似电影索引错误')
+            if state is None:
+                self.build()
+                return
+
+            query = db.session.query(*[getattr(Movie, name) for name in _COLUMNS])
+            if state.watermark is not None:
+                # 重新扫描水位线之前的一段窗口，迟提交或与水位线同一秒更新的行不会被漏掉
+                query = query.filter(Movie.updated_at >= state.watermark - WATERMARK_OVERLAP)
+            rows = query.order_by(Movie.updated_at, Movie.id).all()
+            overlay, dead, watermark = dict(state.overlay), state.dead.copy(), state.watermark
+            if rows:
+                for row, vector in zip(rows, self._vectors(rows, state.idf)):
+                    if row.updated_at is not None:
+                        watermark = row.updated_at
+                    # 窗口内特征没有变化的电影保持原样，不会因重复扫描挤进覆盖层触发重建
+                    current = state.vector(row.id)
+                    if current is not None and np.allclose(current, vector, atol=1e-6):
+                        continue
+                    overlay[row.id] = vector
+                    i = state.row_of(row.id)
+                    if i is not None:
+                        dead[i] = True
+                state = _State(state.generation, state.ids, state.matrix, state.idf, watermark, overlay, dead)
+
+            # updated_at 无法反映删除，行数或 id 之和不一致时再比对 id
+            count, id_sum = db.session.query(db.func.count(Movie.id), db.func.sum(Movie.id)).one()
+            if (count, int(id_sum or 0)) != state.live_checksum():
+                live_ids = {movie_id for movie_id, in db.session.query(Movie.id)}
+                dead = dead | ~np.isin(state.ids, np.fromiter(live_ids, dtype=np.int64, count=len(live_ids)))
+                overlay = {movie_id: vector for movie_id, vector in overlay.items() if movie_id in live_ids}
+                state = _State(state.generation, state.ids, state.matrix, state.idf, watermark, overlay, dead)
+
+            changed = len(state.overlay) + int(state.dead.sum())
+            if changed > max(COMPACT_MIN_ROWS, len(state.ids) * 0.05):
+                self.build()
+                return
+            self._state = state
+            self._last_refresh = now
+        finally:
+            self._lock.release()
+
+    # ---- 查询 ----
+
+    def similar(self, movie_id, limit=10):
+        """与 movie_id 最相似的电影 [(movie_id, score), ...]，电影不在索引中时返回 None"""
+        self.ensure_fresh()
+        state = self._state
+        vector = state.vector(movie_id)
+        if vector is None:
+            return None
+        return state.top_k(vector, limit, exclude=(movie_id,))
+
+    def similar_to_many(self, movie_ids, limit=10):
+        """与一组电影整体最相似的电影，用各自向量之和作为查询，不包含 movie_ids 本身"""
+        self.ensure_fresh()
+        state = self._state
+        vectors = [vector for vector in map(state.vector, movie_ids) if vector is not None]
+        if not vectors:
+            return []
+        query = np.sum(vectors, axis=0)
+        norm = np.linalg.norm(query)
+        if norm == 0 or not math.isfinite(norm):
+            return []
+        return state.top_k(query / norm, limit, exclude=set(movie_ids))
+
+
+similar_index = SimilarIndex()
@@ -0,0 +1,153 @@
+"""静态文件（头像、海报）分发
+
+STATIC_DELIVERY 可选:
+
+- python: 由 Flask 发送文件，支持 ETag / If-Modified-Since 条件请求和 Range，
+  客户端接受时优先发送预压缩的 .br / .gz 文件（flask static-compress 生成）
+- x-accel: 只返回 X-Accel-Redirect 头，由 nginx 发送文件，需要对应的 internal location:
+
+      location /_static/ {
+          internal;
+          alias /path/to/backend/app/static/;
+          gzip_static on;
+      }
+
+- x-sendfile: 返回 X-Sendfile 头，用于 Apache mod_xsendfile / lighttpd
+
+文件名中带内容哈希的文件（如头像 <hash>-256.png）内容不会改变，
+返回 Cache-Control: immutable 和一年的缓存期。
+"""
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+import click
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # 未安装时只生成 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_MODES = ('python', 'x-accel', 'x-sendfile')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# 文件名中 16 位以上十六进制串视为内容哈希
+HASHED_NAME = re.compile(r'(?:^|[.\-_])[0-9a-f]{16,}(?:[.\-_])')
+# (Accept-Encoding 中的名称, 文件后缀)，按优先级排列
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# 图片等已压缩格式不生成预压缩文件
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# 小于该字节数的文件压缩收益不大
+MIN_COMPRESS_SIZE = 1024
+COMPRESSED_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+
+
+def is_immutable(filename):
+    return HASHED_NAME.search(os.path.basename(filename)) is not None
+
+
+def _compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticDelivery:
+    """替换 Flask 默认的 static 视图"""
+
+    def __init__(self):
+        self._mode = 'python'
+        self._max_age = 3600
+        self._accel_prefix = '/_static/'
+        self._folder = None
+
+    def init_app(self, app):
+        self._mode = app.config.get('STATIC_DELIVERY', 'python')
+        if self._mode not in DELIVERY_MODES:
+            raise ValueError(f'STATIC_DELIVERY 只能是 {", ".join(DELIVERY_MODES)}: {self._mode}')
+        self._max_age = app.config.get('STATIC_MAX_AGE', self._max_age)
+        self._accel_prefix = app.config.get('STATIC_ACCEL_PREFIX', self._accel_prefix).rstrip('/') + '/'
+        self._folder = app.static_folder
+        if self._mode == 'x-sendfile':
+            app.config['USE_X_SENDFILE'] = True
+        app.view_functions['static'] = self.serve
+
+        @app.cli.command('static-compress')
+        def static_compress_command():
+            """为静态目录中的文本类文件生成 .gz（安装了 brotli 时还有 .br）"""
+            click.echo(f'已生成 {self.compress_all()} 个预压缩文件')
+
+    def _cache_control(self, response, filename):
+        # send_file 在未指定 max_age 时会加上 no-cache
+        response.cache_control.no_cache = None
+        if is_immutable(filename):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = self._max_age
+
+    def _precompressed(self, path):
+        """客户端接受且存在预压缩文件时返回 (编码, 路径)"""
+        accepted = request.accept_encodings
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and os.path.isfile(path + suffix):
+                return encoding, path + suffix
+        return None, path
+
+    def serve(self, filename):
+        path = safe_join(self._folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        if self._mode == 'x-accel':
+            response = current_app.response_class()
+            response.headers['X-Accel-Redirect'] = self._accel_prefix + filename.replace(os.sep, '/')
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            self._cache_control(response, filename)
+            return response
+
+        encoding, send_path = self._precompressed(path) if _compressible(filename) else (None, path)
+        response = send_file(
+            send_path,
+            mimetype=mimetypes.guess_type(filename)[0],
+            conditional=True,
+            etag=True,
+            max_age=None,
+        )
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if _compressible(filename):
+            response.vary.add('Accept-Encoding')
+        self._cache_control(response, filename)
+        return response
+
+    def compress_all(self):
+        count = 0
+        for root, _, files in os.walk(self._folder):
+            for name in files:
+                path = os.path.join(root, name)
+                if (name.endswith(COMPRESSED_SUFFIXES) or not _compressible(name)
+                        or os.path.getsize(path) < MIN_COMPRESS_SIZE):
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                outputs = {'.gz': gzip.compress(data, 9, mtime=0)}
+                if brotli is not None:
+                    outputs['.br'] = brotli.compress(data, quality=11)
+                for suffix, content in outputs.items():
+                    # 压缩后没有变小的不保存
+                    if len(content) < len(data):
+                        with open(path + suffix, 'wb') as f:
+                            f.write(content)
+                        count += 1
+        logger.info('静态文件预压缩完成', extra={'files': count})
+        return count
+
+
+static_files = StaticDelivery()
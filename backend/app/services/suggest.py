@@ -0,0 +1,122 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from app.extensions import db
+from app.models.movie import Movie
+from app.models.search_history import SearchHistory
+from app.services.background import IndexNotReady, background_tasks
+
+logger = logging.getLogger(__name__)
+
+# 电影标题的基础权重，搜索历史按出现次数累加
+TITLE_WEIGHT = 1
+# 参与补全的热门搜索词数量上限
+MAX_POPULAR_QUERIES = 10000
+# 词典重建间隔（秒）
+REBUILD_INTERVAL = 300
+# 不超过该长度的前缀缓存 top-k 结果，短前缀匹配的范围最大
+CACHED_PREFIX_LEN = 2
+# 后台线程首次构建完成前，建议客户端重试的间隔（秒）
+RETRY_AFTER = 5
+
+
+class Suggester:
+    """基于有序数组和二分查找的前缀补全"""
+
+    def __init__(self):
+        # (小写后的有序补全词, 对齐的 (原文, 权重), 短前缀结果缓存)，整体替换保证读取一致
+        self._data = ([], [], {})
+        self._built_at = 0.0
+        self._build_lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        interval = app.config.get('SUGGEST_REBUILD_INTERVAL', REBUILD_INTERVAL)
+        if interval:
+            background_tasks.register(lambda: self._start(app, interval))
+
+    def _start(self, app, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(app, interval), name='suggest-rebuild', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    with self._build_lock:
+                        self.build()
+                except Exception:
+                    logger.exception('重建补全词典错误')
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def build(self):
+        """从电影标题和热门搜索词重建词典"""
+        weights = {}
+        for title, in db.session.query(Movie.title).yield_per(1000):
+            if title:
+                key = title.strip().lower()
+                text, weight = weights.get(key, (title.strip(), 0))
+                weights[key] = (text, weight + TITLE_WEIGHT)
+
+        popular = db.session.query(
+            SearchHistory.search_query,
+            db.func.count(SearchHistory.id).label('hits')
+        ).group_by(SearchHistory.search_query) \
+            .order_by(db.desc('hits')) \
+            .limit(MAX_POPULAR_QUERIES)
+        for search_query, hits in popular:
+            key = search_query.strip().lower()
+            if key:
+                text, weight = weights.get(key, (search_query.strip(), 0))
+                weights[key] = (text, weight + hits)
+
+        keys = sorted(weights)
+        entries = [weights[key] for key in keys]
+        self._data = (keys, entries, {})
+        self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """查询前调用: 后台线程运行时只检查词典是否已完成首次构建，词典重建完成后整体替换"""
+        if self._thread is not None:
+            if not self._built_at:
+                raise IndexNotReady('补全词典正在构建，请稍后重试', RETRY_AFTER)
+            return
+        if self._built_at and time.monotonic() - self._built_at <= REBUILD_INTERVAL:
+            return
+        # 已有线程在重建时直接使用旧词典
+        if self._build_lock.acquire(blocking=self._built_at == 0.0):
+            try:
+                self.build()
+            finally:
+                self._build_lock.release()
+
+    def suggest(self, prefix, limit=10):
+        """返回以 prefix 开头、权重最高的 limit 个补全词"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        keys, entries, cache = self._data
+        cacheable = len(prefix) <= CACHED_PREFIX_LEN
+        if cacheable:
+            cached = cache.get(prefix)
+            if cached is not None and len(cached) >= limit:
+                return cached[:limit]
+
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+        top = heapq.nsmallest(limit, range(lo, hi), key=lambda i: (-entries[i][1], keys[i]))
+        result = [entries[i][0] for i in top]
+        if cacheable:
+            cache[prefix] = result
+        return result
+
+
+suggester = Suggester()
@@ -0,0 +1,149 @@
+import atexit
+import logging
+import threading
+
+from app.extensions import db
+from app.services.background import background_tasks
+
+logger = logging.getLogger(__name__)
+
+# 同一条记录累计写入失败的次数上限，超过后丢弃（如用户已被删除导致的外键错误）
+MAX_FLUSH_ATTEMPTS = 5
+
+
+class WriteBuffer:
+    """按键合并的批量写入缓冲
+
+    同一个键只保留最新的值，到达时间间隔或条数阈值后由后台线程批量写入，间隔为 0 时
+    每次 put 直接写入。同一时间只有一个线程写入，先取出的旧值不会在新值之后提交。
+    整批失败时逐行重试，仍然失败的行放回缓冲区，累计失败 MAX_FLUSH_ATTEMPTS 次后
+    丢弃，个别无法写入的行不会拖住后续的每一批，flush 也不会抛出异常。
+
+    子类实现 _row（键和值转换为一行）和 _write（写入并提交），label 用于日志。
+    """
+
+    label = '缓冲数据'
+    thread_name = 'write-buffer'
+
+    def __init__(self):
+        self._pending = {}        # 键 -> 值
+        self._attempts = {}       # 键 -> 累计写入失败次数
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._app = None
+        self._interval = 0
+        self._max_pending = 500
+        self._thread = None
+
+    def configure(self, app, interval, max_pending):
+        self._app = app
+        self._interval = interval
+        self._max_pending = max_pending
+        if interval:
+            background_tasks.register(self._start)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_in_context)
+
+    def put(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            size = len(self._pending)
+        if not self._interval:
+            # 未启用后台刷新时直接写入
+            self.flush()
+        elif size >= self._max_pending:
+            self._wakeup.set()
+
+    def discard(self, match, delete=None):
+        """丢弃 match(键) 为真的未写入数据，并在同一把写入锁内执行 delete 删除已写入的行
+
+        与 flush 互斥: 正在写入的一批提交之后才执行删除，写入失败放回缓冲区的行也在
+        此时丢弃，删除的数据不会再被写回。返回 (丢弃的条数, delete 的返回值)。
+        """
+        with self._flush_lock:
+            with self._lock:
+                keys = [key for key in self._pending if match(key)]
+                for key in keys:
+                    del self._pending[key]
+                for key in [key for key in self._attempts if match(key)]:
+                    del self._attempts[key]
+            return len(keys), delete() if delete is not None else None
+
+    def flush(self):
+        """把缓冲区中的数据写入数据库，返回写入条数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            items = list(pending.items())
+            try:
+                self._write([self._row(key, value) for key, value in items])
+                written, failed = items, []
+            except Exception:
+                db.session.rollback()
+                logger.warning(f'批量写入{self.label}失败，逐行重试', exc_info=True)
+                written, failed = self._write_each(items)
+            self._requeue(failed)
+            with self._lock:
+                for key, _ in written:
+                    self._attempts.pop(key, None)
+            if written:
+                self._written([key for key, _ in written])
+            return len(written)
+
+    def _row(self, key, value):
+        raise NotImplementedError
+
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def _written(self, keys):
+        """写入成功后调用，keys 为写入的键"""
+
+    def _write_each(self, items):
+        written, failed = [], []
+        for key, value in items:
+            try:
+                self._write([self._row(key, value)])
+                written.append((key, value))
+            except Exception:
+                db.session.rollback()
+                failed.append((key, value))
+        return written, failed
+
+    def _requeue(self, items):
+        with self._lock:
+            for key, value in items:
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self._attempts.pop(key, None)
+                    logger.error(f'{self.label}多次写入失败，已丢弃', extra={'key': repr(key)})
+                    continue
+                self._attempts[key] = attempts
+                # 保留期间收到的更新
+                self._pending.setdefault(key, value)
+
+    def _flush_in_context(self):
+        with self._app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(f'写入{self.label}错误')
+            finally:
+                db.session.remove()
+
+    def _tick(self):
+        """后台线程每次写入之后调用，子类可用于定期维护"""
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            self._flush_in_context()
+            self._tick()
@@ -0,0 +1,80 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+# LogRecord 自带的属性，其余通过 extra= 传入的字段原样输出
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'request_id'}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """给日志记录附加当前请求的关联 ID"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, 'request_id', None)
+            record.path = request.path
+        else:
+            record.request_id = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        payload = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            payload['request_id'] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def init_logging(app):
+    """配置 app.* 日志: 请求线程只把记录放进队列，由后台线程格式化并输出"""
+    global _listener
+
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+
+    if _listener is None:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # 过滤器在请求线程中执行，才能读取到请求上下文
+        queue_handler.addFilter(RequestIdFilter())
+        logger.addHandler(queue_handler)
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        request_id = getattr(g, 'request_id', None)
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import date
+
+
+class InvalidCursor(ValueError):
+    """游标参数无法解析"""
+
+
+def encode_cursor(sort_value, last_id):
+    """将排序键编码为不透明的游标字符串"""
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回 (sort_value, last_id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, int(last_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('无效的分页游标')
+
+
+def parse_page_args(args, default_limit=20, max_limit=100, parse_value=None):
+    """从请求参数中读取 limit 和 cursor，cursor 解析为 (sort_value, last_id) 或 None"""
+    limit = max(1, min(args.get('limit', default_limit, type=int), max_limit))
+    cursor = args.get('cursor')
+    if not cursor:
+        return limit, None
+    last_value, last_id = decode_cursor(cursor)
+    if last_value is not None and parse_value:
+        try:
+            last_value = parse_value(last_value)
+        except (ValueError, TypeError):
+            raise InvalidCursor('无效的分页游标')
+    return limit, (last_value, last_id)
+
+
+def parse_fields(raw, allowed, required=('id',)):
+    """解析 fields= 参数，返回按 allowed 顺序排列的字段列表"""
+    if not raw:
+        return list(allowed)
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}")
+    requested.update(required)
+    return [name for name in allowed if name in requested]
+
+
+def keyset_filter(query, sort_column, id_column, cursor, descending=True):
+    """按 (sort_column, id) 对查询追加游标条件和排序
+
+    降序时 NULL 排在最后（MySQL 与 SQLite 默认行为），因此游标落在 NULL
+    区间后只在 NULL 行中继续按 id 翻页。
+    """
+    from app.extensions import db
+
+    if sort_column is None or sort_column is id_column:
+        if cursor is not None:
+            _, last_id = cursor
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+
+    if cursor is not None:
+        last_value, last_id = cursor
+        if last_value is None:
+            query = query.filter(sort_column.is_(None), id_column < last_id)
+        else:
+            query = query.filter(db.or_(
+                sort_column < last_value,
+                db.and_(sort_column == last_value, id_column < last_id),
+                sort_column.is_(None)
+            ))
+    return query.order_by(sort_column.desc(), id_column.desc())
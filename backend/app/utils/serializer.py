@@ -0,0 +1,233 @@
+import csv
+import io
+from functools import lru_cache
+from operator import attrgetter
+
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库 json
+    orjson = None
+
+
+# ---- 格式化 ----
+
+@lru_cache(maxsize=16384)
+def format_date(value):
+    """YYYY-MM-DD，上映日期大量重复，结果按日期缓存"""
+    return value.strftime('%Y-%m-%d')
+
+
+def format_datetime(value):
+    """YYYY-MM-DD HH:MM:SS，与 strftime('%Y-%m-%d %H:%M:%S') 结果相同但更快"""
+    return value.isoformat(' ', 'seconds')
+
+
+def format_isoformat(value):
+    return value.isoformat()
+
+
+# ---- 字段计划 ----
+
+class Serializer:
+    """按预先编译的字段计划把模型对象或查询结果行转换为字典
+
+    fields 为 (字段名, 格式化函数) 序列，格式化函数为 None 时原样输出，
+    值为 None 时不调用格式化函数。only() 生成的子计划会被缓存。
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.names = tuple(name for name, _ in self.fields)
+        self._formatters = dict(self.fields)
+        self._formatted = tuple((name, fmt) for name, fmt in self.fields if fmt is not None)
+        if len(self.names) == 1:
+            name = self.names[0]
+            self._values = lambda obj: (getattr(obj, name),)
+        else:
+            self._values = attrgetter(*self.names)
+        self._subsets = {}
+
+    def one(self, obj):
+        data = dict(zip(self.names, self._values(obj)))
+        for name, fmt in self._formatted:
+            value = data[name]
+            if value is not None:
+                data[name] = fmt(value)
+        return data
+
+    def many(self, objs):
+        one = self.one
+        return [one(obj) for obj in objs]
+
+    def only(self, names):
+        """只包含 names 中字段的子计划"""
+        names = tuple(names)
+        subset = self._subsets.get(names)
+        if subset is None:
+            subset = self._subsets[names] = Serializer((name, self._formatters[name]) for name in names)
+        return subset
+
+
+movie_list_serializer = Serializer([
+    ('id', None),
+    ('title', None),
+    ('description', None),
+    ('release_date', format_date),
+    ('movie_type', None),
+    ('poster_url', None),
+    ('director', None),
+    ('rating', None),
+])
+
+movie_serializer = Serializer(movie_list_serializer.fields + (
+    ('created_at', format_datetime),
+    ('updated_at', format_datetime),
+))
+
+user_serializer = Serializer([
+    ('id', None),
+    ('username', None),
+    ('email', None),
+    ('avatar', None),
+    ('is_vip', None),
+    ('created_at', format_datetime),
+    ('updated_at', format_datetime),
+])
+
+# WatchHistory.page_for_user 返回的行
+history_serializer = Serializer([
+    ('id', None),
+    ('movie_id', None),
+    ('title', None),
+    ('poster_url', None),
+    ('watch_time', format_isoformat),
+    ('progress', None),
+])
+
+# Favorite.page_for_user 返回的行
+favorite_serializer = Serializer([
+    ('id', None),
+    ('movie_id', None),
+    ('title', None),
+    ('description', None),
+    ('poster_url', None),
+    ('release_date', format_date),
+    ('movie_type', None),
+    ('director', None),
+    ('rating', None),
+    ('add_time', format_isoformat),
+])
+
+
+# ---- JSON 编码 ----
+
+class FastJSONProvider(DefaultJSONProvider):
+    """安装了 orjson 时用它编码/解码，否则与 Flask 默认实现相同
+
+    日期时间交给 Flask 的 default 处理，输出格式与标准库编码一致。
+    """
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        separators = kwargs.pop('separators', None)
+        if orjson is None or kwargs or indent not in (None, 2):
+            return super().dumps(obj, indent=indent, separators=separators, **kwargs)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            # 超过 64 位的整数等 orjson 不支持的值
+            return super().dumps(obj, indent=indent, separators=separators)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def iter_json_array(items, serializer=None, chunk_size=500):
+    """逐块生成 JSON 数组文本，不在内存中构建完整列表"""
+    dumps = current_app.json.dumps
+    convert = serializer.one if serializer is not None else None
+    separator = ''
+    chunk = []
+    yield '['
+    for item in items:
+        chunk.append(dumps(convert(item) if convert else item))
+        if len(chunk) >= chunk_size:
+            yield separator + ','.join(chunk)
+            separator, chunk = ',', []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']'
+
+
+def stream_json(envelope, key, items, serializer=None):
+    """流式返回 envelope 加上 key: [items...] 的 JSON 响应，用于行数很多的列表"""
+    dumps = current_app.json.dumps
+    head = dumps(envelope).rstrip()[:-1]
+    prefix = head + (',' if envelope else '') + dumps(key) + ':'
+
+    def generate():
+        yield prefix
+        yield from iter_json_array(items, serializer)
+        yield '}'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+# ---- 导出 ----
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_ndjson(rows, serializer, chunk_size=500):
+    """每行一个 JSON 对象，按块输出"""
+    dumps = current_app.json.dumps
+    one = serializer.one
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(one(row)))
+        if len(chunk) >= chunk_size:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def iter_csv(rows, serializer, chunk_size=500):
+    """首行为字段名的 CSV，按块输出"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(serializer.names)
+    one = serializer.one
+    for i, row in enumerate(rows, 1):
+        writer.writerow(one(row).values())
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_response(rows, serializer, fmt, filename):
+    """以附件形式流式返回 rows，rows 应为 yield_per 查询，内存占用与行数无关"""
+    generate = iter_csv if fmt == 'csv' else iter_ndjson
+    response = current_app.response_class(
+        stream_with_context(generate(rows, serializer)), mimetype=EXPORT_FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    # 关闭 nginx 的响应缓冲，边查询边发送
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,56 @@
+from app.extensions import db
+
+
+def upsert(model, rows, index_elements, update_columns):
+    """批量插入或更新
+
+    rows 为字典列表，index_elements 是唯一约束包含的列，冲突时用新值覆盖
+    update_columns。MySQL 使用 ON DUPLICATE KEY UPDATE，SQLite/PostgreSQL 使用
+    ON CONFLICT DO UPDATE，都只需要一条 executemany 语句。
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_columns})
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={name: stmt.excluded[name] for name in update_columns}
+        )
+    else:
+        raise NotImplementedError(f'不支持的数据库: {dialect}')
+    db.session.execute(stmt, rows)
+
+
+def insert_ignore(model, rows, index_elements):
+    """批量插入，与 index_elements 上的唯一约束冲突的行跳过
+
+    MySQL 使用 ON DUPLICATE KEY UPDATE 把冲突列更新为原值（INSERT IGNORE 还会吞掉
+    其他错误），SQLite/PostgreSQL 使用 ON CONFLICT DO NOTHING。
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update({name: table.c[name] for name in index_elements})
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        raise NotImplementedError(f'不支持的数据库: {dialect}')
+    db.session.execute(stmt, rows)
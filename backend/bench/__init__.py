@@ -0,0 +1,9 @@
+"""API 基准测试: 生成合成数据集并对主要接口施加并发负载
+
+用法（在 backend 目录下）:
+
+    python -m bench seed --size 10k
+    python -m bench run --size 10k --output baseline.json
+    python -m bench compare baseline.json current.json
+    python -m bench check-plans --size 10k    # 接口查询出现全表扫描时返回非零
+"""
@@ -0,0 +1,184 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+from datetime import datetime
+
+from sqlalchemy.engine import make_url
+
+from bench.load import HttpTarget, InProcessTarget, compare, dump, run_all
+from bench.plans import check_plans
+from bench.seed import SIZES, USERS_PER_MOVIE, WORDS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def default_db_uri(size):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return 'sqlite:///' + os.path.join(DATA_DIR, f'bench-{size}.db')
+
+
+def is_bench_db(db_uri):
+    """db_uri 是否为 bench/data 下的 SQLite 文件"""
+    url = make_url(db_uri)
+    if not url.drivername.startswith('sqlite') or not url.database:
+        return False
+    return os.path.abspath(url.database).startswith(DATA_DIR + os.sep)
+
+
+def thread_rng(seed):
+    """返回获取当前线程专用 random.Random 的函数，压测线程之间不共享随机数状态"""
+    local = threading.local()
+    seeds = itertools.count(seed)
+
+    def get():
+        rng = getattr(local, 'rng', None)
+        if rng is None:
+            rng = local.rng = random.Random(next(seeds))
+        return rng
+    return get
+
+
+def make_app(db_uri):
+    """基于测试配置创建应用，数据库改为 db_uri"""
+    from app import create_app
+    from app.config.config import TestingConfig, config
+
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': db_uri,
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL') or 'WARNING',
+    })
+    return create_app('benchmark')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_scenarios(app, movies, rng):
+    from flask_jwt_extended import create_access_token
+
+    n_users = max(10, int(movies * USERS_PER_MOVIE))
+    with app.app_context():
+        tokens = [create_access_token(identity=str(rng.randint(1, n_users))) for _ in range(50)]
+
+    def auth(i):
+        return {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}
+
+    # make_request 在多个压测线程中调用
+    local_rng = thread_rng(rng.randrange(2 ** 32))
+
+    sorts = ['id', 'rating', 'release_date']
+    return {
+        'movies_list': ('movies.get_movies', lambda i: (f'/api/movies?limit=20&sort={sorts[i % 3]}', {})),
+        'search': ('movies.search_movies', lambda i: (f'/api/search?query={WORDS[i % len(WORDS)]}', {})),
+        'movie_detail': ('movies.get_movie_detail', lambda i: (f'/api/movies/{local_rng().randint(1, movies)}', {})),
+        'history': ('history.get_history', lambda i: ('/api/history?limit=20', auth(i))),
+        'rankings': ('search.get_movie_rankings', lambda i: ('/api/search/rankings', {})),
+    }
+
+
+def plan_requests(app, movies, rng):
+    """执行计划检查覆盖的请求: 基准场景各取几次，再加上场景之外的只读接口"""
+    requests = []
+    for _, make_request in build_scenarios(app, movies, rng).values():
+        requests.extend(make_request(i) for i in range(3))
+    requests += [
+        ('/api/movies?category_id=1,2', {}),
+        ('/api/movies?limit=20&sort=rating&fields=id,title,rating', {}),
+        ('/api/categories', {}),
+        ('/api/categories/1', {}),
+        ('/api/search/rankings?period=weekly', {}),
+        ('/api/search/history?user_id=1', {}),
+        ('/api/search/suggest?prefix=' + WORDS[0][:1], {}),
+    ]
+    return requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='电影 API 基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = sub.add_parser('seed', help='生成合成数据集')
+    seed_parser.add_argument('--size', choices=SIZES, default='10k')
+    seed_parser.add_argument('--db', help='数据库地址，默认 bench/data 下的 SQLite 文件')
+    seed_parser.add_argument('--force', action='store_true',
+                             help='允许清空 bench/data 以外的数据库（会删除其中所有表）')
+
+    run_parser = sub.add_parser('run', help='运行负载并输出 JSON 结果')
+    run_parser.add_argument('--size', choices=SIZES, default='10k')
+    run_parser.add_argument('--db', help='数据库地址，默认 bench/data 下的 SQLite 文件')
+    run_parser.add_argument('--url', help='压测运行中的服务，不指定时在进程内调用')
+    run_parser.add_argument('--requests', type=int, default=500, help='每个场景的请求数')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--warmup', type=int, default=20, help='每个场景不计入结果的预热请求数')
+    run_parser.add_argument('--output', help='结果写入的 JSON 文件')
+
+    plans_parser = sub.add_parser('check-plans', help='检查接口查询是否存在全表扫描，发现时返回非零')
+    plans_parser.add_argument('--size', choices=SIZES, default='10k')
+    plans_parser.add_argument('--db', help='数据库地址，默认 bench/data 下的 SQLite 文件')
+
+    compare_parser = sub.add_parser('compare', help='对比两次运行结果')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+        print(json.dumps(compare(baseline, current), ensure_ascii=False, indent=2))
+        return 0
+
+    if args.command == 'seed' and args.db and not args.force and not is_bench_db(args.db):
+        # seed 会 drop_all，防止误删开发或生产数据库
+        print(f'拒绝清空 bench/data 以外的数据库: {args.db}，确认无误请加 --force', file=sys.stderr)
+        return 2
+
+    app = make_app(args.db or default_db_uri(args.size))
+    movies = SIZES[args.size]
+
+    if args.command == 'seed':
+        from bench.seed import seed
+        with app.app_context():
+            counts = seed(movies)
+        print(counts)
+        return 0
+
+    rng = random.Random(42)
+    if args.command == 'check-plans':
+        checked, problems = check_plans(app, plan_requests(app, movies, rng))
+        for problem in problems:
+            print(json.dumps(problem, ensure_ascii=False))
+        print(f'检查 {checked} 条查询，{len(problems)} 条为全表扫描', file=sys.stderr)
+        return 1 if problems else 0
+
+    target = HttpTarget(args.url) if args.url else InProcessTarget(app)
+    results = run_all(target, build_scenarios(app, movies, rng), args.requests, args.concurrency, args.warmup)
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'size': args.size,
+        'target': args.url or 'in-process',
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'warmup': args.warmup,
+        'scenarios': results,
+    }
+    if args.output:
+        dump(report, args.output)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+
+class InProcessTarget:
+    """通过 Flask test client 在进程内发请求，不经过网络"""
+
+    def __init__(self, app):
+        self._app = app
+
+    def get(self, path, headers):
+        with self._app.test_client() as client:
+            response = client.get(path, headers=headers)
+            return response.status_code, response.get_data()
+
+
+class HttpTarget:
+    """对运行中的服务发 HTTP 请求"""
+
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip('/')
+
+    def get(self, path, headers):
+        request = urllib.request.Request(self._base_url + path, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def parse_query_counts(metrics_text):
+    """从 /metrics 中读取每个端点的 db_queries_per_request 累计值 (sum, count)"""
+    totals = defaultdict(lambda: [0.0, 0])
+    for line in metrics_text.splitlines():
+        for suffix, index in (('_sum', 0), ('_count', 1)):
+            prefix = f'db_queries_per_request{suffix}{{endpoint="'
+            if line.startswith(prefix):
+                endpoint, value = line[len(prefix):].split('"} ')
+                totals[endpoint][index] = float(value)
+    return totals
+
+
+def run_scenario(target, name, make_request, requests, concurrency):
+    """并发执行 requests 次请求，返回延迟分位数和吞吐量"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        local = []
+        local_errors = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            path, headers = make_request(i)
+            start = time.perf_counter()
+            status, _ = target.get(path, headers)
+            local.append(time.perf_counter() - start)
+            if status >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f'bench-{name}-{n}') for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_all(target, scenarios, requests, concurrency, warmup=20):
+    """依次运行各场景，并根据 /metrics 的差值计算每个请求的 SQL 条数
+
+    每个场景先发 warmup 个不计入结果的请求，让索引和缓存完成构建。
+    """
+    results = {}
+    for name, (endpoint, make_request) in scenarios.items():
+        for i in range(warmup):
+            target.get(*make_request(i))
+        before = parse_query_counts(target.get('/metrics', {})[1].decode('utf-8'))
+        result = run_scenario(target, name, make_request, requests, concurrency)
+        after = parse_query_counts(target.get('/metrics', {})[1].decode('utf-8'))
+        queries = after[endpoint][0] - before[endpoint][0]
+        handled = after[endpoint][1] - before[endpoint][1]
+        result['queries_per_request'] = round(queries / handled, 2) if handled else None
+        results[name] = result
+    return results
+
+
+def compare(baseline, current):
+    """对比两次结果，返回每个场景关键指标的变化比例"""
+    report = {}
+    for name, result in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if not base:
+            continue
+        report[name] = {
+            key: {
+                'baseline': base[key],
+                'current': result[key],
+                'change': round((result[key] - base[key]) / base[key], 4) if base[key] else None,
+            }
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')
+            if base.get(key) is not None and result.get(key) is not None
+        }
+    return report
+
+
+def dump(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
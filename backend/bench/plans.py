@@ -0,0 +1,111 @@
+import re
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from app.extensions import db
+
+# 行数不超过该值的表允许全表扫描（分类等字典表）
+SMALL_TABLE_ROWS = 1000
+
+# 有意读取整张表的语句: 内存中的搜索索引和联想词表定期构建，需要全部电影和搜索词
+ALLOWED_SCANS = (
+    re.compile(r'^SELECT movie\.id AS movie_id, movie\.updated_at AS movie_updated_at, .* FROM movie$'),
+    re.compile(r'^SELECT count\(movie\.id\) AS count_1 FROM movie$'),
+    re.compile(r'^SELECT movie\.title AS movie_title FROM movie$'),
+    re.compile(r'^SELECT search_history\.search_query AS search_history_search_query, '
+               r'count\(search_history\.id\) AS hits FROM search_history GROUP BY '),
+)
+
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+_LIMIT_RE = re.compile(r'\bLIMIT\b', re.I)
+_WHERE_RE = re.compile(r'\bWHERE\b', re.I)
+
+
+def capture_selects(app, requests):
+    """在进程内依次发出请求，收集执行过的 SELECT 语句及其参数（按语句去重）"""
+    captured = OrderedDict()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and statement not in captured:
+            captured[statement] = parameters
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        with app.test_client() as client:
+            for path, headers in requests:
+                client.get(path, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def _table_rows(conn, table, cache):
+    if table not in cache:
+        cache[table] = conn.exec_driver_sql(f'SELECT COUNT(*) FROM {table}').scalar()
+    return cache[table]
+
+
+def _sqlite_plan(conn, statement, parameters):
+    """返回 (全表扫描列表, 是否需要额外排序)"""
+    details = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    scans = []
+    for detail in details:
+        # SCAN t 表示按 rowid 顺序读全表；SCAN t USING INDEX ... 是索引顺序扫描
+        match = _SQLITE_SCAN_RE.match(detail)
+        if match:
+            scans.append((match.group(1), detail, None))
+    return scans, any('USE TEMP B-TREE' in detail for detail in details)
+
+
+def _mysql_plan(conn, statement, parameters):
+    scans, sorts = [], False
+    for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings():
+        sorts = sorts or 'filesort' in (row['Extra'] or '')
+        if row['type'] == 'ALL' and row['table'] and not row['table'].startswith('<'):
+            # EXPLAIN 中的 table 可能是别名，直接使用优化器估算的行数
+            scans.append((row['table'], 'type=ALL', row['rows']))
+    return scans, sorts
+
+
+PLANNERS = {
+    'sqlite': _sqlite_plan,
+    'mysql': _mysql_plan,
+}
+
+
+def check_plans(app, requests):
+    """返回 (检查的语句数, 计划为全表扫描的查询列表)
+
+    小表的全表扫描代价可以忽略；没有 WHERE、也不需要额外排序的 LIMIT 查询读到足够的行
+    即停止（如列表首页）。这两种情况以及 ALLOWED_SCANS 中的语句不计入。
+    """
+    captured = capture_selects(app, requests)
+    problems = []
+    counts = {}
+    with app.app_context():
+        engine = db.engine
+        planner = PLANNERS.get(engine.dialect.name)
+        if planner is None:
+            raise RuntimeError(f'不支持的数据库: {engine.dialect.name}')
+        with engine.connect() as conn:
+            for statement, parameters in captured.items():
+                normalized = ' '.join(statement.split())
+                if any(pattern.match(normalized) for pattern in ALLOWED_SCANS):
+                    continue
+                scans, sorts = planner(conn, statement, parameters)
+                if _LIMIT_RE.search(normalized) and not _WHERE_RE.search(normalized) and not sorts:
+                    continue
+                for table, detail, rows in scans:
+                    if rows is None:
+                        rows = _table_rows(conn, table, counts)
+                    if rows > SMALL_TABLE_ROWS:
+                        problems.append({
+                            'table': table,
+                            'rows': rows,
+                            'plan': detail,
+                            'statement': normalized,
+                        })
+    return len(captured), problems
@@ -0,0 +1,121 @@
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models.category import Category
+from app.models.history import WatchHistory
+from app.models.movie import Movie
+from app.models.search_history import SearchHistory
+from app.models.user import User
+from app.services.importer import link_categories
+from app.services.rankings import rankings
+
+SIZES = {
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+CATEGORIES = ['动作', '喜剧', '科幻', '爱情', '动漫', '剧情', '恐怖', '纪录片']
+DIRECTORS = ['张艺谋', '陈凯歌', '贾玲', '宁浩', '郭帆', '文牧野', 'Christopher Nolan', 'Denis Villeneuve']
+WORDS = ['你好', '李焕英', '流浪', '地球', '刺杀', '小说家', '唐人街', '探案', '孤注一掷', '哪吒',
+         '魔童', '奇迹', '笨小孩', '长津湖', '满江红', 'star', 'night', 'city', 'love', 'war']
+
+BATCH_SIZE = 5000
+BENCH_PASSWORD = 'bench123'
+# 用户规模与观看/搜索记录数相对电影数的比例
+USERS_PER_MOVIE = 0.1
+HISTORY_PER_USER = 20
+SEARCHES_PER_USER = 5
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(model, rows):
+    count = 0
+    for batch in _batches(rows):
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+def _title(rng, i):
+    return ''.join(rng.sample(WORDS, rng.randint(1, 3))) + f' {i}'
+
+
+def seed(movies, seed_value=42):
+    """生成确定性的合成数据集，返回各表写入的行数，需在应用上下文中调用"""
+    rng = random.Random(seed_value)
+    n_users = max(10, int(movies * USERS_PER_MOVIE))
+    now = datetime.utcnow()
+
+    db.drop_all()
+    db.create_all()
+
+    counts = {}
+    counts['category'] = _bulk_insert(Category, (
+        {'name': name, 'description': f'{name}类电影'} for name in CATEGORIES
+    ))
+    counts['movie'] = _bulk_insert(Movie, (
+        {
+            'title': _title(rng, i),
+            'description': ' '.join(rng.choices(WORDS, k=30)),
+            'release_date': date(1980, 1, 1) + timedelta(days=rng.randint(0, 16000)),
+            'movie_type': rng.choice(CATEGORIES),
+            'poster_url': f'https://example.com/posters/{i}.jpg',
+            'director': rng.choice(DIRECTORS),
+            'rating': round(rng.uniform(1, 10), 1),
+            'created_at': now,
+            'updated_at': now,
+        }
+        for i in range(1, movies + 1)
+    ))
+    # 所有用户共用一个密码哈希，避免生成数据时耗费大量 CPU
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    counts['movie_category'] = link_categories()
+    db.session.commit()
+    counts['users'] = _bulk_insert(User, (
+        {
+            'username': f'bench_user_{i}',
+            'email': f'bench_user_{i}@example.com',
+            'password_hash': password_hash,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for i in range(1, n_users + 1)
+    ))
+    counts['watch_history'] = _bulk_insert(WatchHistory, (
+        {
+            'user_id': user_id,
+            'movie_id': movie_id,
+            'progress': round(rng.uniform(0, 100), 1),
+            'watch_time': now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        }
+        for user_id in range(1, n_users + 1)
+        for movie_id in rng.sample(range(1, movies + 1), min(HISTORY_PER_USER, movies))
+    ))
+    counts['search_history'] = _bulk_insert(SearchHistory, (
+        {
+            'user_id': user_id,
+            'search_query': search_query,
+            'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 14)),
+        }
+        for user_id in range(1, n_users + 1)
+        # (user_id, search_query) 唯一，每个用户的搜索词不能重复
+        for search_query in rng.sample(WORDS, SEARCHES_PER_USER)
+    ))
+    rankings.refresh_all()
+    return counts
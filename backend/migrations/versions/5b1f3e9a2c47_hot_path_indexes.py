@@ -0,0 +1,123 @@
+"""hot path indexes, upsert unique keys and InnoDB
+
+- MySQL 上把 MyISAM 表转为 InnoDB（行级锁、事务）
+- movie_rankings 增加 period 列，新增 movie_category 关联表
+- 为列表、历史、排行榜的过滤/排序列建立复合索引
+- watch_history / search_history 去重后建立 upsert 所需的唯一索引
+
+每一步都先检查对象是否已存在，可以在 db.create_all() 建过表的库上执行。
+
+Revision ID: 5b1f3e9a2c47
+Revises: ecc7e6c5efa6
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f3e9a2c47'
+down_revision = 'ecc7e6c5efa6'
+branch_labels = None
+depends_on = None
+
+# 表名 -> [(索引名, 列, 是否唯一)]
+INDEXES = {
+    'movie': [
+        ('ix_movie_movie_type', ['movie_type'], False),
+        ('ix_movie_rating_id', ['rating', 'id'], False),
+        ('ix_movie_release_date_id', ['release_date', 'id'], False),
+        ('ix_movie_updated_at', ['updated_at'], False),
+    ],
+    'movie_rankings': [
+        ('ix_movie_rankings_period_rank', ['period', 'rank'], False),
+    ],
+    'movie_category': [
+        ('ix_movie_category_category_movie', ['category_id', 'movie_id'], False),
+    ],
+    'watch_history': [
+        ('uq_watch_history_user_movie', ['user_id', 'movie_id'], True),
+        ('ix_watch_history_user_watch_time', ['user_id', 'watch_time'], False),
+    ],
+    'search_history': [
+        ('uq_search_history_user_query', ['user_id', 'search_query'], True),
+        ('ix_search_history_user_created', ['user_id', 'created_at'], False),
+    ],
+}
+
+# 唯一索引名 -> (表, 分组列, 过滤条件)，建索引前删除重复行，每组保留 id 最大（最新）的一条
+DEDUPE = {
+    'uq_watch_history_user_movie': ('watch_history', 'user_id, movie_id', None),
+    # user_id 为 NULL 的匿名记录不受唯一索引约束
+    'uq_search_history_user_query': ('search_history', 'user_id, search_query', 'user_id IS NOT NULL'),
+}
+
+
+def _existing_indexes(inspector, table):
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    names.update(constraint['name'] for constraint in inspector.get_unique_constraints(table))
+    return names
+
+
+def _convert_to_innodb(bind):
+    tables = bind.execute(sa.text(
+        "SELECT table_name FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE' AND engine <> 'InnoDB'"
+    )).scalars().all()
+    for table in tables:
+        op.execute(f'ALTER TABLE `{table}` ENGINE=InnoDB')
+
+
+def _dedupe(table, columns, condition):
+    where = f' WHERE {condition}' if condition else ''
+    also = f' AND {condition}' if condition else ''
+    # 多包一层子查询，MySQL 不允许 DELETE 的子查询直接引用目标表
+    op.execute(
+        f'DELETE FROM {table} WHERE id NOT IN ('
+        f'SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM {table}{where} GROUP BY {columns}) AS keep'
+        f'){also}'
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        _convert_to_innodb(bind)
+
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if 'period' not in {column['name'] for column in inspector.get_columns('movie_rankings')}:
+        op.add_column('movie_rankings', sa.Column(
+            'period', sa.String(length=10), nullable=False, server_default='all'
+        ))
+
+    if 'movie_category' not in tables:
+        op.create_table(
+            'movie_category',
+            sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('category_id', sa.Integer(), sa.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True),
+        )
+
+    for name, (table, columns, condition) in DEDUPE.items():
+        if name not in _existing_indexes(inspector, table):
+            _dedupe(table, columns, condition)
+
+    for table, indexes in INDEXES.items():
+        existing = _existing_indexes(inspector, table)
+        for name, columns, unique in indexes:
+            if name not in existing:
+                op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, indexes in INDEXES.items():
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        for name, _, _ in indexes:
+            if name in existing:
+                op.drop_index(name, table_name=table)
+    op.drop_table('movie_category')
+    with op.batch_alter_table('movie_rankings') as batch_op:
+        batch_op.drop_column('period')
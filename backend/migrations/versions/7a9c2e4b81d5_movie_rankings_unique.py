@@ -0,0 +1,48 @@
+"""movie_rankings unique (period, movie_id)
+
+多个进程同时刷新榜单时可能为同一部电影插入重复行，去重后建立唯一索引。
+
+Revision ID: 7a9c2e4b81d5
+Revises: e41b7d9c6a20
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a9c2e4b81d5'
+down_revision = 'e41b7d9c6a20'
+branch_labels = None
+depends_on = None
+
+NAME = 'uq_movie_rankings_period_movie'
+
+
+def _existing_indexes(inspector):
+    names = {index['name'] for index in inspector.get_indexes('movie_rankings')}
+    names.update(constraint['name'] for constraint in inspector.get_unique_constraints('movie_rankings'))
+    return names
+
+
+def upgrade():
+    if NAME in _existing_indexes(sa.inspect(op.get_bind())):
+        return
+    # 每组保留 id 最大（最新）的一条，多包一层子查询，MySQL 不允许 DELETE 的子查询直接引用目标表
+    op.execute(
+        'DELETE FROM movie_rankings WHERE id NOT IN ('
+        'SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM movie_rankings GROUP BY period, movie_id) AS keep'
+        ')'
+    )
+    op.create_index(NAME, 'movie_rankings', ['period', 'movie_id'], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if NAME in {index['name'] for index in inspector.get_indexes('movie_rankings')}:
+        op.drop_index(NAME, table_name='movie_rankings')
+    elif NAME in {constraint['name'] for constraint in inspector.get_unique_constraints('movie_rankings')}:
+        # 由模型的 UniqueConstraint 建立（如 create_all），SQLite 的自动索引不能 DROP INDEX，需要重建表
+        with op.batch_alter_table('movie_rankings') as batch_op:
+            batch_op.drop_constraint(NAME, type_='unique')
@@ -0,0 +1,32 @@
+"""user recommendations
+
+离线计算的个性化推荐，每个用户一行。
+
+Revision ID: 8d2a61c4f0b3
+Revises: 5b1f3e9a2c47
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2a61c4f0b3'
+down_revision = '5b1f3e9a2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'user_recommendations' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'user_recommendations',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('movie_ids', sa.JSON(), nullable=False),
+            sa.Column('generated_at', sa.DateTime(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table('user_recommendations')
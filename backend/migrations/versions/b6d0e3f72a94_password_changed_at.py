@@ -0,0 +1,42 @@
+"""users.password_changed_at
+
+令牌中的密码指纹改为由修改密码的时间计算，登录时按新配置重新哈希不再使其他
+设备上的令牌失效。已有用户以 updated_at（为空时 created_at）回填。
+
+Revision ID: b6d0e3f72a94
+Revises: 7a9c2e4b81d5
+Create Date: 2026-10-18 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d0e3f72a94'
+down_revision = '7a9c2e4b81d5'
+branch_labels = None
+depends_on = None
+
+
+COLUMN = 'password_changed_at'
+
+
+def _has_column():
+    return COLUMN in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+
+
+def upgrade():
+    # 由 db.create_all() 建好的表已经有该列
+    if not _has_column():
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column(COLUMN, sa.DateTime(), nullable=True))
+    op.execute(
+        f'UPDATE users SET {COLUMN} = COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) WHERE {COLUMN} IS NULL'
+    )
+
+
+def downgrade():
+    if _has_column():
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.drop_column(COLUMN)
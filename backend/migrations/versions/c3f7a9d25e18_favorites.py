@@ -0,0 +1,35 @@
+"""favorites
+
+用户收藏，(user_id, movie_id) 唯一。
+
+Revision ID: c3f7a9d25e18
+Revises: 8d2a61c4f0b3
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f7a9d25e18'
+down_revision = '8d2a61c4f0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'favorites' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'favorites',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.UniqueConstraint('user_id', 'movie_id', name='uq_favorites_user_movie'),
+        )
+        op.create_index('ix_favorites_user_created_at', 'favorites', ['user_id', 'created_at'])
+
+
+def downgrade():
+    op.drop_table('favorites')
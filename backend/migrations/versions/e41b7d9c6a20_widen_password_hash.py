@@ -0,0 +1,30 @@
+"""widen password_hash
+
+werkzeug 的 scrypt 哈希长 162 字符，超出原来的 String(128)。
+
+Revision ID: e41b7d9c6a20
+Revises: c3f7a9d25e18
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7d9c6a20'
+down_revision = 'c3f7a9d25e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(128), type_=sa.String(255),
+                              existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(255), type_=sa.String(128),
+                              existing_nullable=False)
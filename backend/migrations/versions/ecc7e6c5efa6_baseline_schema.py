@@ -0,0 +1,94 @@
+"""baseline schema
+
+与 sql/dump-movie_db-202505142038.sql 中 alembic_version 记录的版本号一致，
+从该转储恢复的数据库直接视为处于此版本。新库执行时只创建缺失的表，
+已由 db.create_all() 建好的表会跳过。
+
+Revision ID: ecc7e6c5efa6
+Revises:
+Create Date: 2025-05-14 20:38:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ecc7e6c5efa6'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'category' not in existing:
+        op.create_table(
+            'category',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=50), nullable=False, unique=True),
+            sa.Column('description', sa.String(length=255)),
+        )
+
+    if 'movie' not in existing:
+        op.create_table(
+            'movie',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=100), nullable=False),
+            sa.Column('description', sa.Text()),
+            sa.Column('release_date', sa.Date()),
+            sa.Column('movie_type', sa.String(length=50)),
+            sa.Column('poster_url', sa.String(length=200)),
+            sa.Column('director', sa.String(length=100)),
+            sa.Column('rating', sa.Float()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(length=80), nullable=False, unique=True),
+            sa.Column('email', sa.String(length=120), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(length=128), nullable=False),
+            sa.Column('avatar', sa.String(length=255)),
+            sa.Column('is_vip', sa.Integer()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+        )
+
+    if 'watch_history' not in existing:
+        op.create_table(
+            'watch_history',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movie.id'), nullable=False),
+            sa.Column('watch_time', sa.DateTime()),
+            sa.Column('progress', sa.Float()),
+        )
+
+    if 'search_history' not in existing:
+        op.create_table(
+            'search_history',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+            sa.Column('search_query', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+        )
+
+    if 'movie_rankings' not in existing:
+        op.create_table(
+            'movie_rankings',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('movie_id', sa.Integer(), sa.ForeignKey('movie.id'), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('views', sa.Integer()),
+            sa.Column('last_updated', sa.DateTime()),
+        )
+
+
+def downgrade():
+    for table in ('movie_rankings', 'search_history', 'watch_history', 'users', 'movie', 'category'):
+        op.drop_table(table)
@@ -1,11 +1,15 @@
 from app import create_app, db
 from app.models.category import Category
-from app.models.movie import Movie
 from app.models.movie_ranking import MovieRanking
 from app.models.search_history import SearchHistory
-from datetime import datetime, date, timedelta
+from app.services.importer import link_categories
+from app.services.rankings import rankings
+from datetime import datetime, timedelta
 
-app = create_app()
+# 推荐计算的 spawn 子进程会以 __mp_main__ 重新导入本模块，子进程只执行打分函数，
+# 不需要创建应用（连接数据库、加载索引）
+if __name__ != '__mp_main__':
+    app = create_app()
 
 def init_db():
     with app.app_context():
@@ -35,22 +39,16 @@ def init_db():
 
         
 
-        # 检查是否已有电影排名数据
-        if MovieRanking.query.count() == 0 and Movie.query.count() > 0:
-            # 获取所有电影
-            movies = Movie.query.all()
-            
-            # 为前5部电影添加排名
-            for i, movie in enumerate(movies[:5], 1):
-                ranking = MovieRanking(
-                    movie_id=movie.id,
-                    rank=i,
-                    views=1000 - i * 100  # 简单的浏览量，排名越高浏览量越多
-                )
-                db.session.add(ranking)
-            
-            db.session.commit()
-            print("已添加默认电影排名数据")
+        # 根据 movie_type 补全电影与分类的关联
+        linked = link_categories()
+        db.session.commit()
+        if linked:
+            print(f"已补全 {linked} 条电影分类关联")
+        
+        # 根据真实观看记录生成电影排名
+        if MovieRanking.query.count() == 0:
+            rankings.refresh_all()
+            print("已根据观看记录生成电影排名数据")
             
         # 检查是否已有搜索历史数据    
         if SearchHistory.query.count() == 0:
@@ -36,20 +36,26 @@ const API_PATHS = {
     FEATURED: '/api/movies',      // 添加/api前缀
     ALL: '/api/movies',           // 添加/api前缀
     BY_CATEGORY: (categoryId) => `/api/movies?category_id=${categoryId}`,  // 修改为使用分类ID
-    DETAIL: (movieId) => `/api/movie/${movieId}`  // 添加/api前缀
+    DETAIL: (movieId) => `/api/movie/${movieId}`,  // 添加/api前缀
+    SIMILAR: (movieId) => `/api/movies/${movieId}/similar`  // 相似电影
   },
   AUTH: {
     LOGIN: '/api/auth/login',     // 保持与后端路径一致
     REGISTER: '/api/auth/register', // 保持与后端路径一致
-    PROFILE: '/api/auth/profile'  // 保持与后端路径一致
+    PROFILE: '/api/auth/profile',  // 保持与后端路径一致
+    LOGOUT: '/api/auth/logout'
   },
   SEARCH: {
     MAIN: '/api/search',  // 添加主搜索路径
+    SUGGEST: '/api/search/suggest',  // 输入联想
     HISTORY: '/api/search/history',
     RANKINGS: '/api/search/rankings'
   },
   USER: {
-    PROFILE: '/api/user/profile'
+    PROFILE: '/api/user/profile',
+    RECOMMENDATIONS: '/api/user/recommendations',
+    FAVORITES: '/api/user/favorites',
+    FAVORITES_CHECK: '/api/user/favorites/check'
   }
 };
 
@@ -0,0 +1,82 @@
+import { defineStore } from 'pinia'
+import { ref } from 'vue'
+import axios from 'axios'
+import { getApiUrl, API_PATHS, getToken } from '../api/config'
+
+// 后端一次最多检查的电影数
+const MAX_CHECK_IDS = 500
+
+export const useFavoritesStore = defineStore('favorites', () => {
+  // 已收藏的电影id
+  const favoriteIds = ref(new Set())
+  // 已查询过收藏状态的电影id
+  const checkedIds = new Set()
+  // 等待合并查询的电影id
+  let pendingIds = new Set()
+  let flushTimer = null
+
+  const isFavorite = (movieId) => favoriteIds.value.has(Number(movieId))
+
+  // 同一轮渲染中所有卡片的查询合并为一次请求
+  const flush = async () => {
+    flushTimer = null
+    const ids = [...pendingIds]
+    pendingIds = new Set()
+    const token = getToken()
+    if (!token || ids.length === 0) return
+
+    for (let start = 0; start < ids.length; start += MAX_CHECK_IDS) {
+      const chunk = ids.slice(start, start + MAX_CHECK_IDS)
+      try {
+        const response = await axios.get(getApiUrl(API_PATHS.USER.FAVORITES_CHECK), {
+          headers: { Authorization: `Bearer ${token}` },
+          params: { ids: chunk.join(',') }
+        })
+        // 请求期间已切换账号或退出登录，结果属于旧账号
+        if (getToken() !== token) return
+        if (response.data && response.data.status === 'success') {
+          const next = new Set(favoriteIds.value)
+          response.data.data.forEach(id => next.add(id))
+          favoriteIds.value = next
+        }
+      } catch (err) {
+        // 查询失败的id允许下次重新查询
+        chunk.forEach(id => checkedIds.delete(id))
+        console.error('获取收藏状态失败:', err)
+      }
+    }
+  }
+
+  // 登记需要显示收藏状态的电影
+  const request = (movieId) => {
+    const id = Number(movieId)
+    if (!id || checkedIds.has(id) || !getToken()) return
+    checkedIds.add(id)
+    pendingIds.add(id)
+    if (!flushTimer) {
+      flushTimer = setTimeout(flush, 0)
+    }
+  }
+
+  // 本地收藏/取消收藏后同步状态
+  const setFavorite = (movieId, favorite) => {
+    const id = Number(movieId)
+    const next = new Set(favoriteIds.value)
+    if (favorite) {
+      next.add(id)
+    } else {
+      next.delete(id)
+    }
+    checkedIds.add(id)
+    favoriteIds.value = next
+  }
+
+  // 清空收藏或退出登录后重置
+  const reset = () => {
+    favoriteIds.value = new Set()
+    checkedIds.clear()
+    pendingIds = new Set()
+  }
+
+  return { favoriteIds, isFavorite, request, setFavorite, reset }
+})
@@ -2,6 +2,7 @@ import { defineStore } from 'pinia'
 import { ref } from 'vue'
 import { CookieUtil, axiosInstance, getApiUrl, API_PATHS } from '../api/config'
 import { checkLoginStatus, login as authLogin, logout as authLogout } from '../utils/auth'
+import { useFavoritesStore } from './favorites'
 
 export const useUserStore = defineStore('user', () => {
   // 状态
@@ -74,6 +75,9 @@ export const useUserStore = defineStore('user', () => {
           user_id: user_id
         })
         
+        // 清除上一个账号缓存的收藏状态
+        useFavoritesStore().reset()
+        
         // 存储登录状态
         isLoggedIn.value = true
         userId.value = user_id
@@ -138,6 +142,9 @@ export const useUserStore = defineStore('user', () => {
     // 移除axios默认请求头中的token
     delete axiosInstance.defaults.headers.common['Authorization']
     
+    // 收藏状态属于已登出的账号
+    useFavoritesStore().reset()
+    
     console.log('用户已登出')
   }
 
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { getApiUrl, API_PATHS, CookieUtil } from '../api/config';
+import { useFavoritesStore } from '../stores/favorites';
 
 // 检查用户是否已登录
 export const checkLoginStatus = async () => {
@@ -84,6 +85,9 @@ export const login = async (username, password, rememberMe = false) => {
       // 设置Authorization header
       axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
       
+      // 清除上一个账号缓存的收藏状态
+      useFavoritesStore().reset();
+      
       return { success: true, userId: user_id };
     } else {
       console.error('登录失败, 服务器响应:', response.data);
@@ -110,6 +114,16 @@ export const login = async (username, password, rememberMe = false) => {
 
 // 登出
 export const logout = () => {
+  // 通知后端注销当前令牌，不等待结果
+  const token = CookieUtil.getCookie('token');
+  if (token) {
+    axios.post(getApiUrl(API_PATHS.AUTH.LOGOUT), null, {
+      headers: { Authorization: `Bearer ${token}` }
+    }).catch(err => {
+      console.log('注销令牌失败:', err);
+    });
+  }
+  
   // 清除Cookie
   CookieUtil.deleteCookie('token');
   CookieUtil.deleteCookie('user_id');
@@ -119,5 +133,8 @@ export const logout = () => {
   // 移除axios默认请求头中的token
   delete axios.defaults.headers.common['Authorization'];
   
+  // 收藏状态属于已登出的账号
+  useFavoritesStore().reset();
+  
   console.log('用户已登出');
 }; 
\ No newline at end of file